@@ -1,9 +1,13 @@
 import uuid
 from dataclasses import dataclass
 from datetime import datetime
+from typing import TYPE_CHECKING
 
 from db.database import get_db
 
+if TYPE_CHECKING:
+    from stock.fetch_news import NewsItem
+
 
 @dataclass
 class User:
@@ -192,13 +196,13 @@ def get_recent_articles(symbol: str, since: datetime) -> list[dict]:
         return []
 
 
-def save_articles(articles: list[dict], symbol: str) -> None:
+def save_articles(articles: 'list[NewsItem]', symbol: str) -> None:
     if not articles:
         return
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                candidate_urls = [a.get('link', '') for a in articles if a.get('link')]
+                candidate_urls = [a.link for a in articles if a.link]
                 if candidate_urls:
                     cur.execute(
                         "SELECT url FROM news_articles WHERE url = ANY(%s)",
@@ -209,11 +213,11 @@ def save_articles(articles: list[dict], symbol: str) -> None:
                     existing_urls = set()
 
                 for a in articles:
-                    url = a.get('link', '')
+                    url = a.link
                     if not url or url in existing_urls:
                         continue
                     published_at = None
-                    raw_date = a.get('published', '')
+                    raw_date = a.published
                     if raw_date:
                         try:
                             published_at = datetime.strptime(raw_date, '%Y-%m-%d %H:%M')
@@ -223,8 +227,8 @@ def save_articles(articles: list[dict], symbol: str) -> None:
                         """INSERT INTO news_articles (symbol, title, url, publisher, summary, published_at)
                            VALUES (%s, %s, %s, %s, %s, %s)
                            ON CONFLICT (url) DO NOTHING""",
-                        (symbol.upper(), a.get('title', ''), url,
-                         a.get('publisher', ''), a.get('summary', ''), published_at)
+                        (symbol.upper(), a.title, url,
+                         a.publisher, a.summary, published_at)
                     )
     except Exception as e:
         print(f"  [db] save_articles error: {e}")
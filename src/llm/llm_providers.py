@@ -3,8 +3,16 @@ LLM Provider abstraction for supporting multiple AI services
 """
 
 import os
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
-from utils.rate_limiter import RateLimiter
+from utils.rate_limiter import RateLimiter, TokenBucket
+
+# Limits applied to every request, so a provider hiccup can't stall a run
+DEFAULT_MAX_TOKENS = 1024        # visible output tokens when the caller doesn't say
+REQUEST_TIMEOUT_SECONDS = 60
+MAX_RETRIES = 3                  # retries after the first attempt, for transient errors
 
 
 class LLMProvider(ABC):
@@ -15,6 +23,13 @@ class LLMProvider(ABC):
         """Generate text from a prompt. Subclasses accept provider-specific kwargs."""
         pass
 
+    def stream(self, prompt: str, **kwargs):
+        """
+        Yield the response as text chunks while it is generated. Providers
+        without a streaming API yield the whole response at once.
+        """
+        yield self.generate(prompt, **kwargs)
+
     def supports_batching(self) -> bool:
         """Whether this provider benefits from batching multiple stocks"""
         return False
@@ -25,22 +40,34 @@ class ClaudeProvider(LLMProvider):
 
     def __init__(self):
         import anthropic
-        self.client = anthropic.Anthropic(api_key=os.getenv('CLAUDE_API_KEY'))
+        # The SDK retries 429/5xx/timeouts itself with exponential backoff
+        self.client = anthropic.Anthropic(
+            api_key=os.getenv('CLAUDE_API_KEY'),
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            max_retries=MAX_RETRIES,
+        )
         self.model = "claude-sonnet-4-20250514"
 
-    def generate(self, prompt: str, **kwargs) -> str:
+    def _create_kwargs(self, prompt: str, kwargs: dict) -> dict:
         create_kwargs = {
             "model": self.model,
-            "max_tokens": kwargs.get("max_tokens", 1024),
+            "max_tokens": kwargs.get("max_tokens", DEFAULT_MAX_TOKENS),
             "messages": [{"role": "user", "content": prompt}],
         }
         if "system" in kwargs:
             create_kwargs["system"] = kwargs["system"]
         if "temperature" in kwargs:
             create_kwargs["temperature"] = kwargs["temperature"]
-        response = self.client.messages.create(**create_kwargs)
+        return create_kwargs
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        response = self.client.messages.create(**self._create_kwargs(prompt, kwargs))
         return response.content[0].text
 
+    def stream(self, prompt: str, **kwargs):
+        with self.client.messages.stream(**self._create_kwargs(prompt, kwargs)) as stream:
+            yield from stream.text_stream
+
     def supports_batching(self) -> bool:
         return False
 
@@ -48,29 +75,141 @@ class ClaudeProvider(LLMProvider):
 class GeminiProvider(LLMProvider):
     """Google Gemini provider - with rate limiting and batching support"""
 
+    MODEL_NAME = 'gemini-flash-latest'
+
+    # Gemini's thinking tokens count toward max_output_tokens, so the cap is the
+    # caller's visible-output budget plus room to think; without it a tight
+    # max_tokens returns an empty or truncated answer. Callers with small caps
+    # pass a matching thinking_tokens; this default is for those that don't.
+    THINKING_HEADROOM_TOKENS = 4096
+
     def __init__(self):
         import google.generativeai as genai
+        from google.api_core import exceptions as api_exceptions
         genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-flash-latest')
-        self.rate_limiter = RateLimiter()
+        self._genai = genai
+        self._retryable = (
+            api_exceptions.ResourceExhausted,
+            api_exceptions.DeadlineExceeded,
+            api_exceptions.ServiceUnavailable,
+            api_exceptions.InternalServerError,
+        )
+        self.model = genai.GenerativeModel(self.MODEL_NAME)
+        self._system_models = {}  # system instruction -> GenerativeModel
+        # Per-minute pacing (requests + tokens) for concurrent batches; the
+        # RateLimiter still tracks the persisted daily request quota
+        self.token_bucket = TokenBucket()
+        self.rate_limiter = RateLimiter(state_file='rate_limiter.json')
+
+    def _model_for(self, system: str | None):
+        """Gemini binds system instructions to the model object; build one per instruction."""
+        if not system:
+            return self.model
+        model = self._system_models.get(system)
+        if model is None:
+            model = self._genai.GenerativeModel(self.MODEL_NAME, system_instruction=system)
+            self._system_models[system] = model
+        return model
+
+    def _request(self, prompt: str, kwargs: dict):
+        """
+        Model, generate_content keyword arguments (bounded output, request
+        timeout), and estimated token cost for one call. Accepts an optional
+        thinking_tokens kwarg: the room to think on top of max_tokens.
+        """
+        system = kwargs.get("system")
+        model = self._model_for(system)
+        max_tokens = kwargs.get("max_tokens", DEFAULT_MAX_TOKENS)
+        thinking_tokens = kwargs.get("thinking_tokens", self.THINKING_HEADROOM_TOKENS)
+        generation_config = {"max_output_tokens": max_tokens + thinking_tokens}
+        if "temperature" in kwargs:
+            generation_config["temperature"] = kwargs["temperature"]
 
-    def generate(self, prompt: str, **kwargs) -> str:
+        request = {
+            "generation_config": generation_config,
+            "request_options": {"timeout": REQUEST_TIMEOUT_SECONDS},
+        }
+        # ~4 characters per token for input, plus the visible output allowance;
+        # thinking headroom is a ceiling, not the expected spend, so it isn't reserved
+        est_tokens = (len(prompt) + len(system or "")) // 4 + max_tokens
+        return model, request, est_tokens
+
+    def _reserve(self, est_tokens: int) -> int:
+        """Wait for the token bucket and the daily rate limiter; returns the reservation."""
+        reserved = self.token_bucket.acquire(est_tokens)
         self.rate_limiter.wait_if_needed()
-        response = self.model.generate_content(prompt)
-        return response.text
+        return reserved
+
+    def _should_retry(self, error: Exception, attempt: int, reserved: int) -> bool:
+        """
+        Give back a failed attempt's reservation. For a transient error with
+        retries left, back off (exponential + jitter) and return True.
+        """
+        self.token_bucket.release(reserved)
+        if not isinstance(error, self._retryable) or attempt == MAX_RETRIES:
+            return False
+        delay = 2 ** attempt + random.random()
+        print(f"  Gemini request failed ({type(error).__name__}), retrying in {delay:.1f}s...")
+        time.sleep(delay)
+        return True
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        model, request, est_tokens = self._request(prompt, kwargs)
+        for attempt in range(MAX_RETRIES + 1):
+            reserved = self._reserve(est_tokens)
+            try:
+                return model.generate_content(prompt, **request).text
+            except Exception as e:
+                if not self._should_retry(e, attempt, reserved):
+                    raise
+
+    def stream(self, prompt: str, **kwargs):
+        """
+        Streamed generate_content. Errors raised while iterating the response
+        go through the same release/retry path as generate(), but only until
+        the first chunk is yielded; after that a retry would repeat text the
+        caller already has, so the error propagates.
+        """
+        model, request, est_tokens = self._request(prompt, kwargs)
+        for attempt in range(MAX_RETRIES + 1):
+            reserved = self._reserve(est_tokens)
+            started = False
+            try:
+                for chunk in model.generate_content(prompt, stream=True, **request):
+                    started = True
+                    yield chunk.text
+                return
+            except Exception as e:
+                if started:
+                    self.token_bucket.release(reserved)
+                    raise
+                if not self._should_retry(e, attempt, reserved):
+                    raise
 
     def supports_batching(self) -> bool:
         return True
 
 
-def get_provider(name: str) -> LLMProvider:
-    """Factory function to get the appropriate LLM provider"""
-    providers = {
-        'claude': ClaudeProvider,
-        'gemini': GeminiProvider
-    }
+_PROVIDERS = {
+    'claude': ClaudeProvider,
+    'gemini': GeminiProvider
+}
 
-    if name.lower() not in providers:
-        raise ValueError(f"Unknown provider: {name}. Valid options: {list(providers.keys())}")
+# One instance per provider for the whole process, so every caller shares the
+# SDK client (and Gemini's rate limiter) instead of constructing its own
+_instances: dict[str, LLMProvider] = {}
+_instances_lock = threading.Lock()
 
-    return providers[name.lower()]()
+
+def get_provider(name: str) -> LLMProvider:
+    """Return the shared instance of the named LLM provider, creating it on first use"""
+    key = name.lower()
+    if key not in _PROVIDERS:
+        raise ValueError(f"Unknown provider: {name}. Valid options: {list(_PROVIDERS.keys())}")
+
+    with _instances_lock:
+        provider = _instances.get(key)
+        if provider is None:
+            provider = _PROVIDERS[key]()
+            _instances[key] = provider
+    return provider
@@ -6,20 +6,22 @@ Fetches stock data, generates AI summaries, and emails daily digest
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Set TEST_MODE before any imports so db.database picks the right DB file
 if '--test' in sys.argv or '-t' in sys.argv:
     os.environ['TEST_MODE'] = 'true'
 
 from stock.fetch_data import fetch_all_data
-from stock.summarize import generate_digest
-from utils.send_email import send_digest_email
 from thesis.thesis_agent import ThesisAgent
 from utils.debug import set_debug
 from utils.news_injector import load_injected_news, validate_injected_news
 from db.database import init_db, purge_old_articles
 from db.queries import get_all_users, get_watchlist, get_thesis
 
+# Users processed concurrently. Each pipeline is I/O-bound (yFinance, LLM, SMTP)
+MAX_USER_WORKERS = 8
+
 def _run_thesis_analysis(user_id, symbols, stocks_data_by_symbol, verbose=False, injected_news=None, scenario='confirms'):
     """
     Run thesis analysis for any symbol that has a thesis in the DB for this user.
@@ -98,17 +100,27 @@ def process_user(user, test_mode=False, injected_news=None, scenario='confirms')
 
     print(f"✓ Successfully fetched data for {len(stocks_data)} stocks")
 
-    # Generate AI summaries
-    print("🤖 Generating AI summaries...")
-    digest = generate_digest(stocks_data, user_name=name)
-    print("✓ Digest generated")
+    # Imported here so runs that bail out before any user is processed don't pay
+    # for the LLM/email imports; the import cache makes this free after the first user
+    from stock.summarize import generate_digest
+    from utils.send_email import send_digest_email
 
-    # Run thesis analysis for any symbols with a thesis in DB
+    # Thesis analysis only needs the fetched data, not the digest, so run it on
+    # a background thread while the digest's LLM calls are in flight
     stocks_by_symbol = {s['symbol'].upper(): s for s in stocks_data}
-    print("📋 Running thesis analysis...")
-    thesis_updates = _run_thesis_analysis(
-        user.id, symbols, stocks_by_symbol, verbose=test_mode, injected_news=injected_news, scenario=scenario
-    )
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        print("📋 Running thesis analysis...")
+        thesis_future = executor.submit(
+            _run_thesis_analysis,
+            user.id, symbols, stocks_by_symbol, verbose=test_mode, injected_news=injected_news, scenario=scenario
+        )
+
+        # Generate AI summaries
+        print("🤖 Generating AI summaries...")
+        digest = generate_digest(stocks_data, user_name=name)
+        print("✓ Digest generated")
+
+        thesis_updates = thesis_future.result()
     if thesis_updates:
         digest += "\n\n" + _build_thesis_section(thesis_updates)
         print(f"✓ Thesis Watch section added ({len(thesis_updates)} ticker(s))")
@@ -184,11 +196,12 @@ def main():
         validate_injected_news(all_symbols, injected_news)
         print(f"[--inject-news] Running scenario '{scenario}' for {len(injected_news)} symbols")
 
-    # Process each user
-    results = []
-    for user in users:
-        success = process_user(user, test_mode=test_mode, injected_news=injected_news, scenario=scenario)
-        results.append(success)
+    # Process users concurrently; map() keeps results in user order
+    def _process(user):
+        return process_user(user, test_mode=test_mode, injected_news=injected_news, scenario=scenario)
+
+    with ThreadPoolExecutor(max_workers=min(MAX_USER_WORKERS, len(users))) as executor:
+        results = list(executor.map(_process, users))
     
     # Summary
     print()
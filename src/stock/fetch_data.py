@@ -1,12 +1,25 @@
-import yfinance as yf
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import json
-from stock.fetch_news import fetch_stock_news
+from stock.fetch_news import NewsItem, fetch_stock_news
 from stock.fetch_earnings import fetch_earnings_data
 from stock.cache import stock_cache
+from stock.yf_cache import get_ticker, get_profile, download_history, yahoo_call
 from stock.news_enricher import enrich_articles
 from db.queries import get_recent_articles, save_articles
 
+# Max symbols fetched concurrently. Every fetch is network-bound, so threads
+# overlap the Yahoo round-trips; kept modest to stay under Yahoo's rate limits.
+MAX_FETCH_WORKERS = 8
+
+# Per-run fetches keyed by symbol. Users are processed in parallel and often
+# share symbols, so a symbol already fetched (or in flight) for one user is
+# reused by the next instead of being fetched again.
+_fetch_executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS)
+_symbol_futures: dict[str, Future] = {}
+_symbol_futures_lock = threading.Lock()
+
 def load_watchlist(filepath='data/watchlist.json'):
     """Load stock symbols from watchlist file"""
     try:
@@ -27,26 +40,33 @@ def load_users(filepath='data/users.json'):
         print(f"Users file not found at {filepath}")
         return []
 
-def fetch_stock_data(symbol):
-    """Fetch current price, change, and basic info for a stock"""
+def fetch_stock_data(symbol, hist=None):
+    """
+    Fetch current price, change, and basic info for a stock.
+    hist: optional pre-fetched 2-day price history (e.g. from a batched download)
+    """
     try:
-        ticker = yf.Ticker(symbol)
+        ticker = get_ticker(symbol)
 
         # Try using history for price data - most reliable
-        hist = ticker.history(period="2d")
+        if hist is None:
+            hist = yahoo_call(ticker.history, period="2d")
         if hist.empty:
             print(f"  No price data for {symbol}")
             return None
 
-        current_price = hist['Close'].iloc[-1]
-        previous_close = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
+        closes = hist['Close'].to_numpy()
+        current_price = closes[-1]
+        previous_close = closes[-2] if len(closes) > 1 else current_price
         change_percent = ((current_price - previous_close) / previous_close) * 100
 
-        # Get basic info
+        # Get basic info (name, industry, description) — full .info is only
+        # needed by fetch_earnings_data
         try:
-            info = ticker.info
+            info = get_profile(symbol)
             name = info.get('longName', info.get('shortName', symbol))
         except:
+            info = {}
             name = symbol
 
         return {
@@ -76,13 +96,13 @@ def _fetch_news_with_cache(symbol: str, company_name: str) -> list:
     cached = get_recent_articles(symbol, since)
     if cached:
         articles = [
-            {
-                'title': a['title'],
-                'publisher': a['publisher'],
-                'link': a['url'],
-                'published': a['published_at'].strftime('%Y-%m-%d %H:%M') if a['published_at'] else '',
-                'summary': a['summary'],
-            }
+            NewsItem(
+                title=a['title'],
+                publisher=a['publisher'],
+                link=a['url'],
+                published=a['published_at'].strftime('%Y-%m-%d %H:%M') if a['published_at'] else '',
+                summary=a['summary'],
+            )
             for a in cached
         ]
         print(f"  [{symbol}] Using {len(articles)} cached articles from DB")
@@ -95,21 +115,63 @@ def _fetch_news_with_cache(symbol: str, company_name: str) -> list:
     return enriched
 
 
+def _fetch_symbol(symbol, hist=None):
+    """Fetch price data, news, and earnings for one symbol. Returns None on failure."""
+    print(f"Fetching data for {symbol}...")
+
+    stock_data = fetch_stock_data(symbol, hist)
+    if not stock_data:
+        return None
+
+    stock_data['news'] = _fetch_news_with_cache(symbol, stock_data['name'])
+    stock_data['earnings'] = fetch_earnings_data(symbol)
+    stock_cache.store(symbol, stock_data['info'], stock_data['news'], stock_data['history'])
+    return stock_data
+
+
+def _fetch_into(future, symbol, hist=None):
+    """Run _fetch_symbol and resolve the symbol's claimed placeholder future."""
+    try:
+        future.set_result(_fetch_symbol(symbol, hist))
+    except BaseException as e:
+        future.set_exception(e)
+
+
 def fetch_all_data(watchlist):
     """Fetch data, news, and earnings for all stocks in watchlist"""
-    results = []
+    if not watchlist:
+        return []
+
+    # Claim symbols nobody has fetched yet with placeholder futures, so a user
+    # with an overlapping watchlist waits on them instead of downloading them too
+    claimed = []
+    with _symbol_futures_lock:
+        for symbol in dict.fromkeys(watchlist):
+            if symbol.upper() not in _symbol_futures:
+                future = Future()
+                _symbol_futures[symbol.upper()] = future
+                claimed.append((symbol, future))
+        futures = [_symbol_futures[symbol.upper()] for symbol in watchlist]
+
+    # One batched chart request for every claimed symbol's prices; symbols missing
+    # from the batch fall back to a per-symbol history() call inside fetch_stock_data
+    histories = {}
+    try:
+        histories = download_history([symbol for symbol, _ in claimed])
+    finally:
+        # Symbols are independent, so fetch them concurrently on the shared pool
+        for symbol, future in claimed:
+            _fetch_executor.submit(_fetch_into, future, symbol, histories.get(symbol))
 
-    for symbol in watchlist:
-        print(f"Fetching data for {symbol}...")
+    # Collect in watchlist order
+    results = [future.result() for future in futures]
+    return [r for r in results if r]
 
-        stock_data = fetch_stock_data(symbol)
-        if stock_data:
-            stock_data['news'] = _fetch_news_with_cache(symbol, stock_data['name'])
-            stock_data['earnings'] = fetch_earnings_data(symbol)
-            stock_cache.store(symbol, stock_data['info'], stock_data['news'], stock_data['history'])
-            results.append(stock_data)
 
-    return results
+def clear_fetch_cache():
+    """Forget per-run fetch results so the next fetch_all_data hits yFinance again."""
+    with _symbol_futures_lock:
+        _symbol_futures.clear()
 
 if __name__ == "__main__":
     # Test the fetcher
@@ -1,95 +1,125 @@
-import yfinance as yf
-from datetime import datetime, timedelta
+import math
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from stock.yf_cache import get_ticker, get_info
+from utils.file_cache import cached
+
+EARNINGS_CACHE_TTL = 24 * 60 * 60  # 24 hours
+
+# "No recent earnings" depends on when it was checked (a report can land after
+# the close), so it's only trusted briefly
+EARNINGS_NONE_CACHE_TTL = 30 * 60  # 30 minutes
+
 
 def fetch_earnings_data(symbol, days_back=1):
     """Fetch recent earnings data if available"""
     try:
-        ticker = yf.Ticker(symbol)
-
-        # Get earnings dates
-        earnings_dates = ticker.earnings_dates
-        if earnings_dates is None or earnings_dates.empty:
-            return None
-
-        # Filter for PAST earnings only (dates before now)
-        from datetime import timezone
-        now = datetime.now(timezone.utc)
-        past_earnings = earnings_dates[earnings_dates.index < now]
-
-        if past_earnings.empty:
-            return None
-
-        # Check if the most recent past earnings happened in the last N days
-        cutoff_date = now - timedelta(days=days_back)
-        most_recent = past_earnings.index[0]  # Most recent is first
-
-        if most_recent < cutoff_date:
-            return None
-
-        # Get the most recent earnings data
-        recent_earnings = past_earnings.iloc[[0]]
-
-        # Get financials
-        info = ticker.info
-
-        # Build comprehensive earnings data
-        earnings_data = {
-            'earnings_date': recent_earnings.index[0].strftime('%Y-%m-%d'),
-            'reported_eps': recent_earnings['Reported EPS'].iloc[0] if 'Reported EPS' in recent_earnings else None,
-            'estimated_eps': recent_earnings['EPS Estimate'].iloc[0] if 'EPS Estimate' in recent_earnings else None,
-            'surprise': recent_earnings['Surprise(%)'].iloc[0] if 'Surprise(%)' in recent_earnings else None,
-        }
-
-        # Core financials from info
-        if info:
-            earnings_data.update({
-                # Revenue
-                'revenue': info.get('totalRevenue'),
-                'revenue_yoy_growth': info.get('revenueGrowth'),
-
-                # Earnings
-                'net_income': info.get('netIncomeToCommon'),
-                'eps': info.get('trailingEps'),
-                'forward_eps': info.get('forwardEps'),
-
-                # Margins
-                'gross_margin': info.get('grossMargins'),
-                'operating_margin': info.get('operatingMargins'),
-                'profit_margin': info.get('profitMargins'),
-                'ebitda_margin': info.get('ebitdaMargins'),
-
-                # Cash flow
-                'free_cash_flow': info.get('freeCashflow'),
-                'operating_cash_flow': info.get('operatingCashflow'),
-
-                # Balance sheet
-                'total_cash': info.get('totalCash'),
-                'total_debt': info.get('totalDebt'),
-                'current_ratio': info.get('currentRatio'),
-                'quick_ratio': info.get('quickRatio'),
-
-                # Valuation
-                'market_cap': info.get('marketCap'),
-                'pe_ratio': info.get('trailingPE'),
-                'forward_pe': info.get('forwardPE'),
-                'ps_ratio': info.get('priceToSalesTrailing12Months'),
-                'price_to_book': info.get('priceToBook'),
-                'ev_to_revenue': info.get('enterpriseToRevenue'),
-                'ev_to_ebitda': info.get('enterpriseToEbitda'),
-
-                # Growth metrics
-                'earnings_growth': info.get('earningsGrowth'),
-                'revenue_per_share': info.get('revenuePerShare'),
-
-                # Guidance
-                'target_high_price': info.get('targetHighPrice'),
-                'target_low_price': info.get('targetLowPrice'),
-                'target_mean_price': info.get('targetMeanPrice'),
-                'recommendation': info.get('recommendationKey'),
-            })
-
-        return earnings_data
-
+        return _fetch_earnings_data(symbol, days_back)
     except Exception as e:
         print(f"  Error fetching earnings for {symbol}: {e}")
         return None
+
+
+@cached('earnings', ttl=EARNINGS_CACHE_TTL, none_ttl=EARNINGS_NONE_CACHE_TTL)
+def _fetch_earnings_data(symbol, days_back):
+    """Uncached fetch; raises on failure so errors are never cached."""
+    ticker = get_ticker(symbol)
+
+    # Get earnings dates
+    earnings_dates = ticker.earnings_dates
+    if earnings_dates is None or earnings_dates.empty:
+        return None
+
+    # Find the most recent PAST earnings (dates before now). yFinance returns the
+    # index newest-first, so binary-search its ascending reverse instead of
+    # building a boolean mask over every row.
+    now = datetime.now(timezone.utc)
+    if not earnings_dates.index.is_monotonic_decreasing:
+        earnings_dates = earnings_dates.sort_index(ascending=False)
+    idx = earnings_dates.index
+    now_ts = pd.Timestamp(now)
+    if idx.tz is not None:
+        now_ts = now_ts.tz_convert(idx.tz)
+
+    n_past = idx[::-1].searchsorted(now_ts)
+    if n_past == 0:
+        return None
+    pos = len(idx) - n_past  # position of the most recent past earnings
+
+    # Check if the most recent past earnings happened in the last N days
+    cutoff_date = now - timedelta(days=days_back)
+    most_recent = idx[pos]
+
+    if most_recent < cutoff_date:
+        return None
+
+    # Get the most recent earnings data
+    recent_earnings = earnings_dates.iloc[[pos]]
+
+    # Get financials
+    info = get_info(symbol)
+
+    # Build comprehensive earnings data
+    earnings_data = {
+        'earnings_date': recent_earnings.index[0].strftime('%Y-%m-%d'),
+        'reported_eps': recent_earnings['Reported EPS'].iloc[0] if 'Reported EPS' in recent_earnings else None,
+        'estimated_eps': recent_earnings['EPS Estimate'].iloc[0] if 'EPS Estimate' in recent_earnings else None,
+        'surprise': recent_earnings['Surprise(%)'].iloc[0] if 'Surprise(%)' in recent_earnings else None,
+    }
+
+    # Core financials from info
+    if info:
+        earnings_data.update({
+            # Revenue
+            'revenue': info.get('totalRevenue'),
+            'revenue_yoy_growth': info.get('revenueGrowth'),
+
+            # Earnings
+            'net_income': info.get('netIncomeToCommon'),
+            'eps': info.get('trailingEps'),
+            'forward_eps': info.get('forwardEps'),
+
+            # Margins
+            'gross_margin': info.get('grossMargins'),
+            'operating_margin': info.get('operatingMargins'),
+            'profit_margin': info.get('profitMargins'),
+            'ebitda_margin': info.get('ebitdaMargins'),
+
+            # Cash flow
+            'free_cash_flow': info.get('freeCashflow'),
+            'operating_cash_flow': info.get('operatingCashflow'),
+
+            # Balance sheet
+            'total_cash': info.get('totalCash'),
+            'total_debt': info.get('totalDebt'),
+            'current_ratio': info.get('currentRatio'),
+            'quick_ratio': info.get('quickRatio'),
+
+            # Valuation
+            'market_cap': info.get('marketCap'),
+            'pe_ratio': info.get('trailingPE'),
+            'forward_pe': info.get('forwardPE'),
+            'ps_ratio': info.get('priceToSalesTrailing12Months'),
+            'price_to_book': info.get('priceToBook'),
+            'ev_to_revenue': info.get('enterpriseToRevenue'),
+            'ev_to_ebitda': info.get('enterpriseToEbitda'),
+
+            # Growth metrics
+            'earnings_growth': info.get('earningsGrowth'),
+            'revenue_per_share': info.get('revenuePerShare'),
+
+            # Guidance
+            'target_high_price': info.get('targetHighPrice'),
+            'target_low_price': info.get('targetLowPrice'),
+            'target_mean_price': info.get('targetMeanPrice'),
+            'recommendation': info.get('recommendationKey'),
+        })
+
+    # Missing EPS/surprise cells come back as NaN; store None like any other
+    # missing field, since the disk cache would turn NaN into null anyway
+    return {
+        key: None if isinstance(val, float) and math.isnan(val) else val
+        for key, val in earnings_data.items()
+    }
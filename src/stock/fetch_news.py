@@ -1,51 +1,88 @@
-import yfinance as yf
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from operator import itemgetter
 
-def fetch_stock_news(symbol, days_back=7):
+from stock.yf_cache import get_ticker
+from utils.file_cache import cached
+
+NEWS_CACHE_TTL = 60 * 60  # 1 hour
+
+
+@dataclass(slots=True)
+class NewsItem:
+    title: str
+    publisher: str
+    link: str
+    published: str  # 'YYYY-MM-DD HH:MM'
+    summary: str
+
+
+def fetch_stock_news(symbol, days_back=7) -> list[NewsItem]:
     """Fetch recent news for a stock"""
     try:
-        ticker = yf.Ticker(symbol)
-        news = ticker.news
-
-        if not news:
-            return []
-
-        cutoff_date = datetime.now() - timedelta(days=days_back)
-        recent_news = []
-
-        for article in news:
-            # Handle potential None values
-            if not article:
-                continue
-
-            content = article.get('content')
-            if not content:
-                continue
-
-            # pubDate is in ISO format like '2025-11-18T16:00:39Z'
-            pub_date_str = content.get('pubDate', '')
-
-            try:
-                # Parse ISO format date
-                pub_date = datetime.fromisoformat(pub_date_str.replace('Z', '+00:00'))
-                # Convert to local time (remove timezone info for comparison)
-                pub_date = pub_date.replace(tzinfo=None)
-            except:
-                pub_date = datetime.min
-
-            if pub_date >= cutoff_date:
-                provider = content.get('provider') or {}
-                click_through = content.get('clickThroughUrl') or {}
-
-                recent_news.append({
-                    'title': content.get('title', 'No title'),
-                    'publisher': provider.get('displayName', 'Unknown'),
-                    'link': click_through.get('url', ''),
-                    'published': pub_date.strftime('%Y-%m-%d %H:%M'),
-                    'summary': content.get('summary', '')
-                })
-
-        return recent_news
+        return parse_news(_fetch_raw_news(symbol), days_back)
     except Exception as e:
         print(f"Error fetching news for {symbol}: {e}")
         return []
+
+
+@cached('raw-news', ttl=NEWS_CACHE_TTL)
+def _fetch_raw_news(symbol):
+    """Uncached fetch of yFinance's raw news items; raises on failure so errors are never cached."""
+    return get_ticker(symbol).news or []
+
+
+def _parse_pub_date(pub_date_str):
+    """
+    Parse a Yahoo pubDate into a naive UTC datetime; datetime.min if unparseable.
+    Yahoo's format is fixed-width 'YYYY-MM-DDTHH:MM:SSZ', so slice it directly
+    and only fall back to fromisoformat for anything else.
+    """
+    s = pub_date_str
+    if len(s) == 20 and s[-1] == 'Z':
+        try:
+            return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                            int(s[11:13]), int(s[14:16]), int(s[17:19]))
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(s.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return datetime.min
+
+
+def parse_news(raw_news, days_back=7) -> list[NewsItem]:
+    """Normalize raw yFinance news items into NewsItems published within days_back."""
+    if not raw_news:
+        return []
+
+    cutoff_date = datetime.now() - timedelta(days=days_back)
+
+    # Handle potential None values; pubDate is in ISO format like '2025-11-18T16:00:39Z'
+    dated = []
+    for article in raw_news:
+        content = article.get('content') if article else None
+        if content:
+            dated.append((_parse_pub_date(content.get('pubDate') or ''), content))
+
+    # yFinance doesn't guarantee an order, so sort newest-first once and stop
+    # at the first article older than the cutoff
+    dated.sort(key=itemgetter(0), reverse=True)
+
+    recent_news = []
+    for pub_date, content in dated:
+        if pub_date < cutoff_date:
+            break
+
+        provider = content.get('provider') or {}
+        click_through = content.get('clickThroughUrl') or {}
+
+        recent_news.append(NewsItem(
+            title=content.get('title', 'No title'),
+            publisher=provider.get('displayName', 'Unknown'),
+            link=click_through.get('url', ''),
+            published=pub_date.strftime('%Y-%m-%d %H:%M'),
+            summary=content.get('summary', ''),
+        ))
+
+    return recent_news
@@ -5,14 +5,19 @@ fetches ETF performance + news, and synthesizes a sector narrative via LLM.
 
 import json
 import os
-from datetime import datetime, timedelta
-
-import yfinance as yf
+import threading
+from concurrent.futures import Future
 
 from stock.cache import stock_cache
+from stock.fetch_news import parse_news
+from stock.yf_cache import close_change_pct, get_ticker, yahoo_call
 from utils.debug import debug_log
 
-_sector_context_cache: dict = {}
+# Per-run sector contexts keyed by class name. Users are processed in
+# parallel, so the first caller for a class builds it and the rest wait on its
+# future instead of each fetching the ETF and calling the LLM again.
+_sector_futures: dict[str, Future] = {}
+_sector_futures_lock = threading.Lock()
 _sector_classes_cache: dict | None = None
 
 
@@ -44,61 +49,51 @@ def get_sector_class(ticker: str) -> tuple[str, dict] | tuple[None, None]:
     return None, None
 
 
-def _parse_etf_news(raw_news: list, days_back: int = 3) -> list:
-    """Parse raw yfinance news into normalized article dicts."""
-    cutoff = datetime.now() - timedelta(days=days_back)
-    articles = []
-    for article in raw_news or []:
-        content = article.get('content') or {}
-        pub_str = content.get('pubDate', '')
-        try:
-            pub_date = datetime.fromisoformat(pub_str.replace('Z', '+00:00')).replace(tzinfo=None)
-        except Exception:
-            pub_date = datetime.min
-        if pub_date < cutoff:
-            continue
-        provider = content.get('provider') or {}
-        articles.append({
-            'title': content.get('title', ''),
-            'publisher': provider.get('displayName', ''),
-            'published': pub_date.strftime('%Y-%m-%d %H:%M'),
-            'summary': content.get('summary', ''),
-        })
-    return articles
-
-
 def fetch_sector_context(class_name: str, config: dict) -> dict | None:
     """
     Fetch ETF % change + news for a sector class, then synthesize via LLM.
     Cached per sector so multiple stocks in the same class only trigger one call.
     """
-    if class_name in _sector_context_cache:
-        return _sector_context_cache[class_name]
-
+    with _sector_futures_lock:
+        future = _sector_futures.get(class_name)
+        owner = future is None
+        if owner:
+            future = Future()
+            _sector_futures[class_name] = future
+
+    if owner:
+        context = _build_sector_context(class_name, config)
+        if context is None:
+            # Not cached, so a later call can retry; current waiters get None
+            with _sector_futures_lock:
+                _sector_futures.pop(class_name, None)
+        future.set_result(context)
+    return future.result()
+
+
+def _build_sector_context(class_name: str, config: dict) -> dict | None:
     etf = config['etf']
     print(f"  Fetching sector context: {class_name} ({etf})...")
 
     try:
-        ticker = yf.Ticker(etf)
+        ticker = get_ticker(etf)
 
-        hist = ticker.history(period="2d")
+        hist = yahoo_call(ticker.history, period="2d")
         if hist.empty or len(hist) < 2:
             return None
-        change_pct = (
-            (hist['Close'].iloc[-1] - hist['Close'].iloc[-2]) / hist['Close'].iloc[-2]
-        ) * 100
+        change_pct = close_change_pct(hist)
 
-        articles = _parse_etf_news(ticker.news)
+        articles = parse_news(ticker.news, days_back=3)
         debug_log(
             f"SECTOR NEWS — {class_name} ({etf})",
-            "\n".join(f"[{a['published']}] {a['title']}" for a in articles) or "(none)",
+            "\n".join(f"[{a.published}] {a.title}" for a in articles) or "(none)",
         )
 
         news_text = ""
         for i, a in enumerate(articles[:10], 1):
-            news_text += f"{i}. {a['title']} ({a['publisher']}, {a['published']})\n"
-            if a['summary']:
-                news_text += f"   {a['summary']}\n"
+            news_text += f"{i}. {a.title} ({a.publisher}, {a.published})\n"
+            if a.summary:
+                news_text += f"   {a.summary}\n"
 
         if not news_text:
             news_text = "No recent sector news found."
@@ -120,14 +115,12 @@ Be specific and factual about what is driving the sector right now. Do not use a
         summary = provider.generate(prompt).strip()
         debug_log(f"SECTOR SUMMARY — {class_name}", summary)
 
-        context = {
+        return {
             'class_name': class_name,
             'etf': etf,
             'change_pct': change_pct,
             'summary': summary,
         }
-        _sector_context_cache[class_name] = context
-        return context
 
     except Exception as e:
         print(f"  Could not generate sector context for {class_name}: {e}")
@@ -135,5 +128,5 @@ Be specific and factual about what is driving the sector right now. Do not use a
 
 
 def clear_sector_cache() -> None:
-    global _sector_context_cache
-    _sector_context_cache.clear()
+    with _sector_futures_lock:
+        _sector_futures.clear()
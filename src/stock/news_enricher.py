@@ -25,7 +25,7 @@ def filter_relevant_articles(articles: list, symbol: str, company_name: str) ->
 
     relevant = []
     for article in articles:
-        text = f"{article.get('title', '')} {article.get('summary', '')}".lower()
+        text = f"{article.title} {article.summary}".lower()
         if any(kw in text for kw in keywords):
             relevant.append(article)
 
@@ -42,7 +42,7 @@ def enrich_articles(articles: list, symbol: str, company_name: str) -> list:
 
     if filtered:
         debug_content = "\n\n".join(
-            f"[{a.get('published', 'unknown date')}] {a.get('title', '')}\n  {a.get('summary', '')}"
+            f"[{a.published or 'unknown date'}] {a.title}\n  {a.summary}"
             for a in filtered
         )
     else:
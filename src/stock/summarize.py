@@ -1,8 +1,16 @@
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
 from dotenv import load_dotenv
 from llm.llm_providers import get_provider
 from utils.debug import debug_log
+from utils.file_cache import file_cache
 from stock.fetch_sector import get_sector_class, fetch_sector_context, clear_sector_cache
+from stock.yf_cache import close_change_pct, download_history
 
 # Load environment variables
 load_dotenv()
@@ -10,96 +18,495 @@ load_dotenv()
 # LLM Provider configuration
 DEFAULT_LLM_PROVIDER = 'claude'
 _provider = None  # Lazy-loaded provider instance
+_provider_lock = threading.Lock()  # users are processed on parallel threads
 
 
 def _get_provider():
     """Get or create the LLM provider instance"""
     global _provider
-    if _provider is None:
-        provider_name = os.getenv('LLM_PROVIDER', DEFAULT_LLM_PROVIDER).lower()
-        _provider = get_provider(provider_name)
+    with _provider_lock:
+        if _provider is None:
+            provider_name = os.getenv('LLM_PROVIDER', DEFAULT_LLM_PROVIDER).lower()
+            _provider = get_provider(provider_name)
     return _provider
 
-# Cache for market summary (so we only generate once per run)
+# Role shared by every per-stock and batched digest prompt. Sent as the
+# provider's system instruction so it isn't repeated in each request body.
+SYSTEM_INSTRUCTION = "You are a financial analyst providing daily stock updates."
+
+# Closing "Focus on" checklists for stocks with/without an earnings report
+_FOCUS_EARNINGS = """
+Focus on:
+1. Key earnings metrics and whether they beat/missed expectations
+2. Most important financial trends (margins, growth, cash position)
+3. How the market reacted and why
+4. Critical news developments if any
+
+Be analytical and data-driven. Highlight the most important numbers."""
+
+_FOCUS_NEWS = """
+Focus on:
+1. The most important news developments
+2. How they relate to the price movement
+3. What investors should watch for
+
+Be concise, factual, and actionable. No fluff."""
+
+# Visible-output caps per LLM call (3-4 sentences per stock, 2-3 for the market)
+STOCK_MAX_TOKENS = 512
+MARKET_MAX_TOKENS = 256
+
+# Room to think on top of those caps, for models that count thinking toward
+# their output limit (Gemini); ignored by providers that don't
+STOCK_THINKING_TOKENS = 512
+MARKET_THINKING_TOKENS = 256
+
+# Closing instructions for a single-stock prompt (batched calls carry these
+# in BATCH_SYSTEM_INSTRUCTION instead)
+_SUMMARY_INSTRUCTION = """
+Provide a 3-4 sentence summary. DO NOT include any preamble like "Here's your update" or "Let me summarize". Start directly with the key information."""
+
+_NO_NEWS_INSTRUCTION = "Provide a 3-4 sentence summary analyzing the stock's performance. DO NOT include any preamble. Start directly with analysis. "
+
+_NO_NEWS_TRAILER = """Cover:
+1. The price movement and what it suggests
+2. Whether this aligns with broader market trends
+3. Any technical observations worth noting
+
+Be concise and factual. Mention that no news was available."""
+
+# Max concurrent per-stock LLM calls when a provider doesn't batch
+MAX_SUMMARY_WORKERS = 8
+
+# Max batched LLM calls in flight at once (batching providers)
+MAX_BATCH_WORKERS = 4
+
+# Estimated tokens (input at ~4 chars/token plus each summary's output cap)
+# per batched request; stocks are packed into a batch until the next would
+# exceed this, so earnings-heavy watchlists get smaller batches
+BATCH_TOKEN_BUDGET = 8000
+
+# Digest section rules; send_email renders these as <hr> / dashed <hr>
+_SEP_EQ = "=" * 60
+_SEP_DASH = "-" * 60
+_SUMMARY_SUFFIX = "\n" + _SEP_DASH + "\n"  # closes each stock's summary in the digest
+
+# Every stock's digest entry: bold header line, then the summary text
+_HEADER_FMT = "**{name} ({symbol})**: ${price:.2f} ({change:+.2f}%)\n\n{body}\n"
+
+# Stocks with no news, no earnings, and a move inside this band (percent) get
+# _TRIVIAL as their summary instead of an LLM call
+TRIVIAL_CHANGE_PCT = 0.1
+_TRIVIAL = "No material news or earnings; price moved within noise."
+
+# Summary body when the LLM call fails; never cached or shared between users
+_ERROR_SUMMARY = "Error generating summary."
+
+# Separates per-stock summaries in a batched response; headers are formatted
+# locally, so the model only has to write the analysis text
+STOCK_BOUNDARY = "===STOCK_BOUNDARY==="
+
+# Batched request body: optional market context, then the stock blocks with a
+# rule after each. Only the fields vary per batch; the scaffold is built once.
+_BATCH_STOCK_SEP = "\n\n" + _SEP_EQ + "\n"
+_BATCH_PROMPT_TMPL = (
+    "{market}\nSTOCKS TO ANALYZE ({count} stocks, {count} summaries):\n\n"
+    + _SEP_EQ + "\n\n{stocks}\n\n" + _SEP_EQ
+)
+
+# System instruction for batched calls. Everything that doesn't depend on the
+# stocks (role, output format, both focus checklists) lives here, so every
+# batch request starts with the same prefix for the provider's prompt cache
+# and the per-stock blocks carry only data.
+BATCH_SYSTEM_INSTRUCTION = f"""{SYSTEM_INSTRUCTION}
+
+For EACH stock in the request, in the order given, provide a 3-4 sentence summary. DO NOT include any preamble like "Here's your update" or "Let me summarize". Start directly with the key information.
+
+Output ONLY the analysis text for each stock — no headers, company names, prices, or "---" separator lines (those are added separately).
+
+IMPORTANT: Put a line containing exactly {STOCK_BOUNDARY} between consecutive stocks. Write exactly one summary per stock.
+
+For stocks with an earnings report:{_FOCUS_EARNINGS}
+
+For all other stocks:{_FOCUS_NEWS}"""
+
+# LLM responses are cached on disk by prompt hash, so same-day reruns (or a
+# retry after a failed send) don't re-pay for identical prompts
+LLM_CACHE_TTL = 24 * 60 * 60  # 24 hours
+
+# Summaries are also cached by their inputs (rounded price/change, news titles,
+# earnings date), so an intraday rerun reuses them even when the exact prompt
+# differs, e.g. because the LLM-written market overview changed wording
+SUMMARY_CACHE_TTL = 60 * 60  # 1 hour
+
+# S&P 500, Nasdaq, Dow ETFs for the market overview (this order throughout)
+MARKET_INDICES = ("SPY", "QQQ", "DIA")
+
+# The finished overview (index moves + text) is persisted per UTC hour, so
+# reruns within the hour skip both the index download and the LLM call
+MARKET_OVERVIEW_TTL = 60 * 60  # 1 hour
+
+# Cache for market summary (so we only generate once per run). Users are
+# processed on parallel threads, so the lock makes the first one build it and
+# the rest wait for that result instead of each downloading and generating.
 _market_summary_cache = None
-_stock_summary_cache = {}
+_market_summary_lock = threading.Lock()
+
+# Per-run digest entries keyed by symbol. A symbol already summarized (or in
+# flight) for one user is reused by the next, like fetch_data's _symbol_futures.
+_summary_futures: dict[str, Future] = {}
+_summary_futures_lock = threading.Lock()
+
+
+def _format_entry(stock_data, body):
+    """Digest entry for one stock: locally formatted header plus summary body."""
+    return _HEADER_FMT.format_map({
+        'name': stock_data['name'],
+        'symbol': stock_data['symbol'],
+        'price': stock_data['current_price'],
+        'change': stock_data['change_percent'],
+        'body': body,
+    })
+
+
+def _normalize_separators(body):
+    """
+    Widen a markdown rule the model put before a bold line into the digest's
+    dashed separator. The joiner emits the real separators and the model is
+    told not to write any, so this is only a fallback; it runs on each
+    summary as it arrives and returns the body untouched when there's no rule.
+    """
+    if "---" not in body:
+        return body
+    return body.replace("---\n\n**", _SEP_DASH + "\n\n**")
+
+
+def _is_trivial(stock_data):
+    """True if there is nothing for the LLM to say beyond _TRIVIAL."""
+    return (
+        not stock_data['news']
+        and stock_data.get('earnings') is None
+        and abs(stock_data['change_percent']) < TRIVIAL_CHANGE_PCT
+    )
+
+
+def _semantic_key(prefix, payload):
+    """Cache key for a JSON-able description of an LLM call's inputs."""
+    blob = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return f"{prefix}-{hashlib.blake2b(blob, digest_size=16).hexdigest()}"
+
+
+def _summary_cache_key(stock_data):
+    earnings = stock_data.get('earnings') or {}
+    return _semantic_key(f"{stock_data['symbol'].upper()}/summary", {
+        'price': round(float(stock_data['current_price']), 2),
+        'change': round(float(stock_data['change_percent']), 1),
+        'news': [article.title for article in stock_data['news']],
+        'earnings_date': earnings.get('earnings_date'),
+    })
+
+
+def _cached_summary(stock_data):
+    """Summary body from an earlier run with the same inputs, or None."""
+    entry = file_cache.get(_summary_cache_key(stock_data))
+    return entry['data'] if entry is not None else None
+
+
+def _store_summary(stock_data, body):
+    file_cache.set(_summary_cache_key(stock_data), body, SUMMARY_CACHE_TTL)
+
+
+def _local_entry(stock_data):
+    """Digest entry that needs no LLM call (quiet stock or cached summary), else None."""
+    if _is_trivial(stock_data):
+        return _format_entry(stock_data, _TRIVIAL)
+    body = _cached_summary(stock_data)
+    return _format_entry(stock_data, body) if body is not None else None
+
+
+def _llm_cache_key(provider, prompt, system=None):
+    """Content-addressed cache key for a provider response."""
+    payload = f"{type(provider).__name__}\0{system or ''}\0{prompt}"
+    return f"llm/{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+def _generate_cached(provider, prompt, system=None, max_tokens=STOCK_MAX_TOKENS):
+    """provider.generate, served from the on-disk response cache when possible."""
+    key = _llm_cache_key(provider, prompt, system)
+    entry = file_cache.get(key)
+    if entry is not None:
+        return entry['data']
+
+    response = provider.generate(
+        prompt, system=system, max_tokens=max_tokens, thinking_tokens=STOCK_THINKING_TOKENS,
+    )
+    file_cache.set(key, response, LLM_CACHE_TTL)
+    return response
+
+
+class _SummaryFailed(Exception):
+    """Resolves a shared summary whose LLM call failed, so waiters make their own."""
+
+
+def _drop_claims(claimed):
+    """Forget claimed symbols (if still ours) so the next call regenerates them."""
+    with _summary_futures_lock:
+        for stock_data, future in claimed:
+            if _summary_futures.get(stock_data['symbol']) is future:
+                del _summary_futures[stock_data['symbol']]
+
+
+def _shared_summaries(stocks_data, summarize):
+    """
+    Digest entries for stocks_data in order, shared across users in this run.
+    Symbols nobody has claimed yet are claimed and passed to summarize (a
+    list of stocks -> list of entries); the rest wait on whichever call
+    claimed them. Claimed work finishes before any waiting, so users with
+    overlapping watchlists can't deadlock on each other.
+
+    Only successful summaries are shared. A claimer keeps its own error
+    entry, but the symbol is released and its waiters summarize it again.
+    """
+    claimed = []
+    futures = []
+    with _summary_futures_lock:
+        for stock_data in stocks_data:
+            future = _summary_futures.get(stock_data['symbol'])
+            if future is None:
+                future = Future()
+                _summary_futures[stock_data['symbol']] = future
+                claimed.append((stock_data, future))
+            futures.append(future)
+
+    entries = []
+    if claimed:
+        try:
+            entries = summarize([stock_data for stock_data, _ in claimed])
+        except BaseException as e:
+            # Let a later call retry these symbols; current waiters see the error
+            _drop_claims(claimed)
+            for _, future in claimed:
+                future.set_exception(e)
+            raise
+
+    own = {}
+    failed = []
+    for (stock_data, future), entry in zip(claimed, entries):
+        own[future] = entry
+        if entry == _format_entry(stock_data, _ERROR_SUMMARY):
+            failed.append((stock_data, future))
+        else:
+            future.set_result(entry)
+    # Released before waiters wake, so their retry claims the symbol afresh
+    _drop_claims(failed)
+    for _, future in failed:
+        future.set_exception(_SummaryFailed())
+
+    results = []
+    for stock_data, future in zip(stocks_data, futures):
+        if future in own:
+            results.append(own[future])
+            continue
+        try:
+            results.append(future.result())
+        except _SummaryFailed:
+            results.append(_shared_summaries([stock_data], summarize)[0])
+    return results
 
 
 def clear_summary_cache():
-    global _stock_summary_cache, _market_summary_cache
-    _stock_summary_cache.clear()
-    _market_summary_cache = None
+    global _market_summary_cache
+    with _summary_futures_lock:
+        _summary_futures.clear()
+    with _market_summary_lock:
+        _market_summary_cache = None
     clear_sector_cache()
 
+# Earnings field formatters, one per kind of value, picked per field below
+# Dollar scales as (threshold, divisor, suffix), largest first
+_SCALES = ((1e12, 1e12, "T"), (1e9, 1e9, "B"), (1e6, 1e6, "M"), (0, 1, ""))
+
+
+def _fmt_dollar(val):
+    if val is None:
+        return 'N/A'
+    magnitude = abs(val)  # scale losses and negative cash flows too
+    for threshold, divisor, suffix in _SCALES:
+        if magnitude >= threshold:
+            return f"${val/divisor:.2f}{suffix}"
+    return f"${val:.2f}"  # NaN compares false against every threshold
+
+
+def _fmt_pct(val):
+    """Fraction (0.123) as a percentage (12.30%)."""
+    return 'N/A' if val is None else f"{val*100:.2f}%"
+
+
+def _fmt_ratio(val):
+    return 'N/A' if val is None else f"{val:.2f}"
+
+
+def _fmt_surprise(val):
+    """Surprise is already a percentage."""
+    return 'N/A' if val is None else f"{val:.2f}%"
+
+
+# Earnings report lines as (label, key, formatter) specs. An optional fourth
+# item is a second (label, key, formatter) shown in parentheses on the same line.
+_CORE_FIELDS = (
+    ("Revenue", 'revenue', _fmt_dollar, ("YoY Growth", 'revenue_yoy_growth', _fmt_pct)),
+    ("Net Income", 'net_income', _fmt_dollar),
+    ("EPS", 'eps', _fmt_dollar, ("Forward", 'forward_eps', _fmt_dollar)),
+    ("Earnings Growth", 'earnings_growth', _fmt_pct),
+    ("Gross Margin", 'gross_margin', _fmt_pct),
+    ("Operating Margin", 'operating_margin', _fmt_pct),
+    ("Net Margin", 'profit_margin', _fmt_pct),
+    ("EBITDA Margin", 'ebitda_margin', _fmt_pct),
+    ("Free Cash Flow", 'free_cash_flow', _fmt_dollar),
+    ("Operating Cash Flow", 'operating_cash_flow', _fmt_dollar),
+)
+
+_BALANCE_FIELDS = (
+    ("Total Cash", 'total_cash', _fmt_dollar),
+    ("Total Debt", 'total_debt', _fmt_dollar),
+    ("Current Ratio", 'current_ratio', _fmt_ratio),
+    ("Quick Ratio", 'quick_ratio', _fmt_ratio),
+)
+
+_VALUATION_FIELDS = (
+    ("Market Cap", 'market_cap', _fmt_dollar),
+    ("P/E Ratio", 'pe_ratio', _fmt_ratio, ("Forward", 'forward_pe', _fmt_ratio)),
+    ("P/S Ratio", 'ps_ratio', _fmt_ratio),
+    ("Price-to-Book", 'price_to_book', _fmt_ratio),
+    ("EV/Revenue", 'ev_to_revenue', _fmt_ratio),
+    ("EV/EBITDA", 'ev_to_ebitda', _fmt_ratio),
+    ("Revenue per Share", 'revenue_per_share', _fmt_dollar),
+)
+
+_PERFORMANCE_FIELDS = (
+    ("Reported EPS", 'reported_eps', _fmt_dollar),
+    ("Expected EPS", 'estimated_eps', _fmt_dollar),
+    ("Surprise", 'surprise', _fmt_surprise),
+)
+
+
+class _FieldValues(dict):
+    """format_map values for the earnings templates; absent fields render as N/A."""
+
+    def __missing__(self, key):
+        return 'N/A'
+
+
+def _section_template(title, fields):
+    """Compile field specs into a format_map template: title, then '- Label: {key}' lines."""
+    lines = [title]
+    for label, key, _fmt, *paren in fields:
+        line = f"- {label}: {{{key}}}"
+        if paren:
+            paren_label, paren_key, _paren_fmt = paren[0]
+            line += f" ({paren_label}: {{{paren_key}}})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+_CORE_TMPL = _section_template("CORE FINANCIALS:", _CORE_FIELDS)
+_BALANCE_TMPL = _section_template("BALANCE SHEET:", _BALANCE_FIELDS)
+_VALUATION_TMPL = _section_template("VALUATION:", _VALUATION_FIELDS)
+_PERFORMANCE_TMPL = _section_template("EARNINGS PERFORMANCE:", _PERFORMANCE_FIELDS)
+
+_GUIDANCE_TMPL = """ANALYST GUIDANCE:
+- Target Price Range: {target_low_price} - {target_high_price}
+- Mean Target: {target_mean_price}
+- Recommendation: {recommendation}"""
+
+def _field_formats(*field_groups):
+    """key -> formatter for every field (and parenthesised field) in the specs."""
+    formats = {}
+    for fields in field_groups:
+        for _label, key, fmt, *paren in fields:
+            formats[key] = fmt
+            for _paren_label, paren_key, paren_fmt in paren:
+                formats[paren_key] = paren_fmt
+    return formats
+
+
+# Formatter for every key the templates above reference
+_FIELD_FORMATS = _field_formats(_CORE_FIELDS, _BALANCE_FIELDS, _VALUATION_FIELDS, _PERFORMANCE_FIELDS)
+_FIELD_FORMATS.update(
+    target_low_price=_fmt_dollar,
+    target_high_price=_fmt_dollar,
+    target_mean_price=_fmt_dollar,
+    recommendation=str.upper,
+)
+
+
 def format_earnings_data(earnings):
     """Format earnings data for LLM prompt"""
     if not earnings:
         return None
 
-    def fmt_num(val, prefix='$', suffix='', is_pct=False):
-        if val is None:
-            return 'N/A'
-        if is_pct:
-            return f"{val*100:.2f}%"
-        if prefix == '$' and val > 1e9:
-            return f"${val/1e9:.2f}B"
-        if prefix == '$' and val > 1e6:
-            return f"${val/1e6:.2f}M"
-        return f"{prefix}{val:.2f}{suffix}"
-
-    sections = []
-
-    # Core Financials
-    core = f"""CORE FINANCIALS:
-- Revenue: {fmt_num(earnings.get('revenue'))} (YoY Growth: {fmt_num(earnings.get('revenue_yoy_growth'), '', '', True)})
-- Net Income: {fmt_num(earnings.get('net_income'))}
-- EPS: {fmt_num(earnings.get('eps'), '$')} (Forward: {fmt_num(earnings.get('forward_eps'), '$')})
-- Earnings Growth: {fmt_num(earnings.get('earnings_growth'), '', '', True)}
-- Gross Margin: {fmt_num(earnings.get('gross_margin'), '', '', True)}
-- Operating Margin: {fmt_num(earnings.get('operating_margin'), '', '', True)}
-- Net Margin: {fmt_num(earnings.get('profit_margin'), '', '', True)}
-- EBITDA Margin: {fmt_num(earnings.get('ebitda_margin'), '', '', True)}
-- Free Cash Flow: {fmt_num(earnings.get('free_cash_flow'))}
-- Operating Cash Flow: {fmt_num(earnings.get('operating_cash_flow'))}"""
-    sections.append(core)
-
-    # Balance Sheet
-    balance = f"""BALANCE SHEET:
-- Total Cash: {fmt_num(earnings.get('total_cash'))}
-- Total Debt: {fmt_num(earnings.get('total_debt'))}
-- Current Ratio: {fmt_num(earnings.get('current_ratio'), '')}
-- Quick Ratio: {fmt_num(earnings.get('quick_ratio'), '')}"""
-    sections.append(balance)
-
-    # Valuation
-    valuation = f"""VALUATION:
-- Market Cap: {fmt_num(earnings.get('market_cap'))}
-- P/E Ratio: {fmt_num(earnings.get('pe_ratio'), '')} (Forward: {fmt_num(earnings.get('forward_pe'), '')})
-- P/S Ratio: {fmt_num(earnings.get('ps_ratio'), '')}
-- Price-to-Book: {fmt_num(earnings.get('price_to_book'), '')}
-- EV/Revenue: {fmt_num(earnings.get('ev_to_revenue'), '')}
-- EV/EBITDA: {fmt_num(earnings.get('ev_to_ebitda'), '')}
-- Revenue per Share: {fmt_num(earnings.get('revenue_per_share'), '$')}"""
-    sections.append(valuation)
+    values = _FieldValues()
+    for key, fmt in _FIELD_FORMATS.items():
+        val = earnings.get(key)
+        if val is not None:
+            values[key] = fmt(val)
+
+    sections = [
+        _CORE_TMPL.format_map(values),
+        _BALANCE_TMPL.format_map(values),
+        _VALUATION_TMPL.format_map(values),
+    ]
 
     # Earnings Performance
     if earnings.get('reported_eps') or earnings.get('estimated_eps'):
-        performance = f"""EARNINGS PERFORMANCE:
-- Reported EPS: {fmt_num(earnings.get('reported_eps'), '$')}
-- Expected EPS: {fmt_num(earnings.get('estimated_eps'), '$')}
-- Surprise: {fmt_num(earnings.get('surprise'), '', '%', False)}"""
-        sections.append(performance)
+        sections.append(_PERFORMANCE_TMPL.format_map(values))
 
     # Analyst Guidance
     if earnings.get('target_mean_price'):
-        guidance = f"""ANALYST GUIDANCE:
-- Target Price Range: {fmt_num(earnings.get('target_low_price'), '$')} - {fmt_num(earnings.get('target_high_price'), '$')}
-- Mean Target: {fmt_num(earnings.get('target_mean_price'), '$')}
-- Recommendation: {earnings.get('recommendation', 'N/A').upper()}"""
-        sections.append(guidance)
+        sections.append(_GUIDANCE_TMPL.format_map(values))
 
     return "\n\n".join(sections)
 
+def _format_news(news):
+    """Numbered article list for a stock prompt."""
+    news_lines = []
+    for i, article in enumerate(news, 1):
+        news_lines.append(f"{i}. {article.title} ({article.publisher}, {article.published})\n")
+        if article.summary:
+            news_lines.append(f"   {article.summary}\n")
+    return "".join(news_lines)
+
+
+def _stock_text(stock_data, key, build, value):
+    """
+    Return build(value), memoized on stock_data[key]. stock_data dicts are
+    shared between the batch prompt, per-stock fallback, and every user
+    watching the symbol, so each stock's news/earnings text is built once.
+    """
+    text = stock_data.get(key)
+    if text is None:
+        text = build(value)
+        stock_data[key] = text
+    return text
+
+
+def _market_context_block(market_context):
+    """Index moves + overview section shared by the single-stock prompts."""
+    return f"""
+Today's Market Context:
+- S&P 500: {market_context['spy_change']:+.2f}%
+- Nasdaq: {market_context['qqq_change']:+.2f}%
+- Dow Jones: {market_context['dia_change']:+.2f}%
+- Overview: {market_context['summary']}"""
+
+
+def _sector_context_block(sector_context):
+    """Sector ETF move + summary section shared by the single-stock prompts."""
+    return f"""
+Today's Sector Context ({sector_context['class_name']} — {sector_context['etf']}: {sector_context['change_pct']:+.2f}%):
+{sector_context['summary']}"""
+
+
 def summarize_stock_news(stock_data, market_context=None, sector_context=None):
     """
     Generate a summary for a single stock's news and earnings
@@ -112,138 +519,52 @@ def summarize_stock_news(stock_data, market_context=None, sector_context=None):
     Returns:
         String summary of the stock's news, earnings, and performance
     """
+    return _shared_summaries(
+        [stock_data],
+        lambda stocks: [_summarize_stock(stocks[0], market_context, sector_context)],
+    )[0]
+
+
+def _summarize_stock(stock_data, market_context=None, sector_context=None):
+    """summarize_stock_news without the per-run sharing; callers have claimed the symbol."""
     symbol = stock_data['symbol']
 
-    if symbol in _stock_summary_cache:
-        return _stock_summary_cache[symbol]
+    local = _local_entry(stock_data)
+    if local is not None:
+        return local
 
-    name = stock_data['name']
-    price = stock_data['current_price']
-    change = stock_data['change_percent']
     news = stock_data['news']
-    earnings = stock_data.get('earnings')
-
     if news:
         news_debug = "\n".join(
-            f"[{a['published']}] {a['title']} ({a['publisher']})\n  {a['summary']}"
+            f"[{a.published}] {a.title} ({a.publisher})\n  {a.summary}"
             for a in news
         )
     else:
         news_debug = "(no articles)"
     debug_log(f"RAW NEWS — {symbol}", news_debug)
 
-    # Check if there's earnings data
-    has_earnings = earnings is not None
-    earnings_text = format_earnings_data(earnings) if has_earnings else ""
-
-    # Build context for the LLM
-    if news or has_earnings:
-        prompt_parts = [f"""You are a financial analyst providing daily stock updates.
-
-Stock: {name} ({symbol})
-Current Price: ${price:.2f}
-Change: {change:+.2f}%"""]
-
-        if has_earnings:
-            prompt_parts.append(f"""
-EARNINGS REPORT (Recent):
-Earnings Date: {earnings.get('earnings_date')}
-
-{earnings_text}""")
-
-        if news:
-            news_text = ""
-            for i, article in enumerate(news, 1):
-                news_text += f"{i}. {article['title']} ({article['publisher']}, {article['published']})\n"
-                if article['summary']:
-                    news_text += f"   {article['summary']}\n"
-            prompt_parts.append(f"""
-Recent News:
-{news_text}""")
-
-        if market_context:
-            prompt_parts.append(f"""
-Today's Market Context:
-- S&P 500: {market_context['spy_change']:+.2f}%
-- Nasdaq: {market_context['qqq_change']:+.2f}%
-- Dow Jones: {market_context['dia_change']:+.2f}%
-- Overview: {market_context['summary']}""")
-
-        if sector_context:
-            prompt_parts.append(f"""
-Today's Sector Context ({sector_context['class_name']} — {sector_context['etf']}: {sector_context['change_pct']:+.2f}%):
-{sector_context['summary']}""")
-
-        prompt_parts.append("""
-Provide a 3-4 sentence summary. DO NOT include any preamble like "Here's your update" or "Let me summarize". Start directly with the key information.""")
-
-        if has_earnings:
-            prompt_parts.append("""
-Focus on:
-1. Key earnings metrics and whether they beat/missed expectations
-2. Most important financial trends (margins, growth, cash position)
-3. How the market reacted and why
-4. Critical news developments if any
-
-Be analytical and data-driven. Highlight the most important numbers.""")
-        else:
-            prompt_parts.append("""
-Focus on:
-1. The most important news developments
-2. How they relate to the price movement
-3. What investors should watch for
-
-Be concise, factual, and actionable. No fluff.""")
-
-        prompt = "\n".join(prompt_parts)
-
-    else:
-        context_section = ""
-        if market_context:
-            context_section += f"""
-Today's Market Context:
-- S&P 500: {market_context['spy_change']:+.2f}%
-- Nasdaq: {market_context['qqq_change']:+.2f}%
-- Dow Jones: {market_context['dia_change']:+.2f}%
-- Overview: {market_context['summary']}
-"""
-        if sector_context:
-            context_section += f"""
-Today's Sector Context ({sector_context['class_name']} — {sector_context['etf']}: {sector_context['change_pct']:+.2f}%):
-{sector_context['summary']}
-"""
-        prompt = f"""You are a financial analyst providing daily stock updates.
-
-Stock: {name} ({symbol})
-Current Price: ${price:.2f}
-Change: {change:+.2f}%
-{context_section}
-No news articles or earnings reports were published recently for this stock.
-
-Provide a 3-4 sentence summary analyzing the stock's performance. DO NOT include any preamble. Start directly with analysis. Cover:
-1. The price movement and what it suggests
-2. Whether this aligns with broader market trends
-3. Any technical observations worth noting
-
-Be concise and factual. Mention that no news was available."""
+    prompt = build_stock_prompt(stock_data, market_context, sector_context)
 
     debug_log(f"STOCK PROMPT — {symbol}", prompt)
 
     try:
         provider = _get_provider()
-        summary = provider.generate(prompt)
+        summary = _normalize_separators(_generate_cached(provider, prompt, system=SYSTEM_INSTRUCTION))
+        _store_summary(stock_data, summary)
 
         # Format the output
-        output = f"**{name} ({symbol})**: ${price:.2f} ({change:+.2f}%)\n\n{summary}\n"
-        _stock_summary_cache[symbol] = output
-        return output
+        return _format_entry(stock_data, summary)
 
     except Exception as e:
         print(f"Error generating summary for {symbol}: {e}")
-        return f"**{name} ({symbol})**: ${price:.2f} ({change:+.2f}%)\n\nError generating summary.\n"
+        return _format_entry(stock_data, _ERROR_SUMMARY)
 
-def build_stock_prompt(stock_data, market_context=None, sector_context=None):
-    """Build the detailed prompt for a single stock (same logic as summarize_stock_news)"""
+def build_stock_prompt(stock_data, market_context=None, sector_context=None, standalone=True):
+    """
+    Build the detailed prompt for a single stock. standalone=False leaves off
+    the summary instructions and "Focus on" checklist, for batched calls that
+    send them once in BATCH_SYSTEM_INSTRUCTION.
+    """
     symbol = stock_data['symbol']
     name = stock_data['name']
     price = stock_data['current_price']
@@ -252,9 +573,11 @@ def build_stock_prompt(stock_data, market_context=None, sector_context=None):
     earnings = stock_data.get('earnings')
 
     has_earnings = earnings is not None
-    earnings_text = format_earnings_data(earnings) if has_earnings else ""
+    earnings_text = ""
+    if has_earnings:
+        earnings_text = _stock_text(stock_data, '_earnings_text', format_earnings_data, earnings)
 
-    # Build context for the LLM (same as individual prompt)
+    # Build context for the LLM
     if news or has_earnings:
         prompt_parts = [f"""Stock: {name} ({symbol})
 Current Price: ${price:.2f}
@@ -268,78 +591,49 @@ Earnings Date: {earnings.get('earnings_date')}
 {earnings_text}""")
 
         if news:
-            news_text = ""
-            for i, article in enumerate(news, 1):
-                news_text += f"{i}. {article['title']} ({article['publisher']}, {article['published']})\n"
-                if article['summary']:
-                    news_text += f"   {article['summary']}\n"
             prompt_parts.append(f"""
 Recent News:
-{news_text}""")
+{_stock_text(stock_data, '_news_text', _format_news, news)}""")
 
         if market_context:
-            prompt_parts.append(f"""
-Today's Market Context:
-- S&P 500: {market_context['spy_change']:+.2f}%
-- Nasdaq: {market_context['qqq_change']:+.2f}%
-- Dow Jones: {market_context['dia_change']:+.2f}%
-- Overview: {market_context['summary']}""")
+            prompt_parts.append(_market_context_block(market_context))
 
         if sector_context:
-            prompt_parts.append(f"""
-Today's Sector Context ({sector_context['class_name']} — {sector_context['etf']}: {sector_context['change_pct']:+.2f}%):
-{sector_context['summary']}""")
-
-        if has_earnings:
-            prompt_parts.append("""
-Focus on:
-1. Key earnings metrics and whether they beat/missed expectations
-2. Most important financial trends (margins, growth, cash position)
-3. How the market reacted and why
-4. Critical news developments if any
-
-Be analytical and data-driven. Highlight the most important numbers.""")
-        else:
-            prompt_parts.append("""
-Focus on:
-1. The most important news developments
-2. How they relate to the price movement
-3. What investors should watch for
+            prompt_parts.append(_sector_context_block(sector_context))
 
-Be concise, factual, and actionable. No fluff.""")
+        if standalone:
+            prompt_parts.append(_SUMMARY_INSTRUCTION)
+            prompt_parts.append(_FOCUS_EARNINGS if has_earnings else _FOCUS_NEWS)
 
         return "\n".join(prompt_parts)
 
     else:
         context_section = ""
         if market_context:
-            context_section += f"""
-Today's Market Context:
-- S&P 500: {market_context['spy_change']:+.2f}%
-- Nasdaq: {market_context['qqq_change']:+.2f}%
-- Dow Jones: {market_context['dia_change']:+.2f}%
-- Overview: {market_context['summary']}
-"""
+            context_section += _market_context_block(market_context) + "\n"
         if sector_context:
-            context_section += f"""
-Today's Sector Context ({sector_context['class_name']} — {sector_context['etf']}: {sector_context['change_pct']:+.2f}%):
-{sector_context['summary']}
-"""
+            context_section += _sector_context_block(sector_context) + "\n"
         return f"""Stock: {name} ({symbol})
 Current Price: ${price:.2f}
 Change: {change:+.2f}%
 {context_section}
 No news articles or earnings reports were published recently for this stock.
 
-Cover:
-1. The price movement and what it suggests
-2. Whether this aligns with broader market trends
-3. Any technical observations worth noting
+{_NO_NEWS_INSTRUCTION if standalone else ""}{_NO_NEWS_TRAILER}"""
+
+def _market_overview_key():
+    return f"market/overview-{time.strftime('%Y%m%d_%H', time.gmtime())}"
 
-Be concise and factual. Mention that no news was available."""
 
 def generate_market_summary():
     """Generate a brief macro market summary using the latest market data"""
+    # Held for the whole build: concurrent users wait for the first one's
+    # overview rather than each downloading the indices and calling the LLM
+    with _market_summary_lock:
+        return _build_market_summary()
+
+
+def _build_market_summary():
     global _market_summary_cache
 
     # Return cached version if available
@@ -347,26 +641,33 @@ def generate_market_summary():
         print("  Using cached market overview...")
         return _market_summary_cache
 
-    try:
-        import yfinance as yf
-
-        # Get major indices
-        spy = yf.Ticker("SPY")  # S&P 500
-        qqq = yf.Ticker("QQQ")  # Nasdaq
-        dia = yf.Ticker("DIA")  # Dow
-
-        # Get today's data
-        spy_hist = spy.history(period="2d")
-        qqq_hist = qqq.history(period="2d")
-        dia_hist = dia.history(period="2d")
-
-        if spy_hist.empty or qqq_hist.empty or dia_hist.empty:
-            return None
+    # An earlier run this hour already fetched the indices and wrote the overview
+    disk_key = _market_overview_key()
+    entry = file_cache.get(disk_key)
+    if entry is not None:
+        print("  Using market overview from earlier run...")
+        _market_summary_cache = entry['data']
+        return _market_summary_cache
 
-        # Calculate changes
-        spy_change = ((spy_hist['Close'].iloc[-1] - spy_hist['Close'].iloc[-2]) / spy_hist['Close'].iloc[-2]) * 100
-        qqq_change = ((qqq_hist['Close'].iloc[-1] - qqq_hist['Close'].iloc[-2]) / qqq_hist['Close'].iloc[-2]) * 100
-        dia_change = ((dia_hist['Close'].iloc[-1] - dia_hist['Close'].iloc[-2]) / dia_hist['Close'].iloc[-2]) * 100
+    try:
+        # One batched download for all three indices instead of a request each;
+        # download_history serializes it with users' watchlist downloads
+        histories = download_history(list(MARKET_INDICES))
+        changes = []
+        for symbol in MARKET_INDICES:
+            hist = histories.get(symbol)
+            if hist is None or len(hist) < 2:
+                return None
+            changes.append(close_change_pct(hist))
+        spy_change, qqq_change, dia_change = changes
+
+        # Reuse an earlier run's overview if the indices haven't meaningfully moved
+        cache_key = _semantic_key("market/summary", {
+            'spy': round(spy_change, 1),
+            'qqq': round(qqq_change, 1),
+            'dia': round(dia_change, 1),
+        })
+        entry = file_cache.get(cache_key)
 
         # Build prompt for macro summary
         prompt = f"""You are a financial analyst providing a brief market overview.
@@ -383,8 +684,14 @@ Provide a concise 2-3 sentence summary of the overall market environment. Focus
 
 DO NOT use a preamble. Start directly with the market analysis."""
 
-        provider = _get_provider()
-        summary_text = provider.generate(prompt)
+        if entry is not None:
+            summary_text = entry['data']
+        else:
+            provider = _get_provider()
+            summary_text = provider.generate(
+                prompt, max_tokens=MARKET_MAX_TOKENS, thinking_tokens=MARKET_THINKING_TOKENS,
+            )
+            file_cache.set(cache_key, summary_text, SUMMARY_CACHE_TTL)
 
         market_summary = {
             'spy_change': spy_change,
@@ -395,6 +702,7 @@ DO NOT use a preamble. Start directly with the market analysis."""
 
         # Cache the result
         _market_summary_cache = market_summary
+        file_cache.set(disk_key, market_summary, MARKET_OVERVIEW_TTL)
 
         return market_summary
 
@@ -402,20 +710,172 @@ DO NOT use a preamble. Start directly with the market analysis."""
         print(f"  Could not generate market summary: {e}")
         return None
 
+def _split_batch_response(response_text, batch):
+    """
+    Split a batched response on STOCK_BOUNDARY into one summary body per
+    stock. Returns None if the piece count doesn't match the batch, so the
+    caller can fall back to per-stock calls.
+    """
+    pieces = [p.strip() for p in response_text.split(STOCK_BOUNDARY)]
+    pieces = [_normalize_separators(p) for p in pieces if p]
+    if len(pieces) != len(batch):
+        print(f"  Batch response had {len(pieces)} summaries for {len(batch)} stocks")
+        return None
+
+    return pieces
+
+
+def _stream_batch_response(provider, prompt, batch):
+    """
+    Stream a batched response, reporting each stock as soon as its section
+    is complete instead of waiting for the whole batch. Returns the full text.
+    """
+    chunks = []
+    pending = ""
+    done = 0
+    max_tokens = STOCK_MAX_TOKENS * len(batch)
+    thinking_tokens = STOCK_THINKING_TOKENS * len(batch)
+    for chunk in provider.stream(
+        prompt, system=BATCH_SYSTEM_INSTRUCTION, max_tokens=max_tokens, thinking_tokens=thinking_tokens,
+    ):
+        chunks.append(chunk)
+        pending += chunk
+        *sections, pending = pending.split(STOCK_BOUNDARY)
+        for section in sections:
+            if section.strip() and done < len(batch):
+                print(f"    ✓ {batch[done]['symbol']}")
+                done += 1
+    # The last section has no boundary after it; it's complete once the stream ends
+    if pending.strip() and done < len(batch):
+        print(f"    ✓ {batch[done]['symbol']}")
+    return "".join(chunks)
+
+
+def _summarize_concurrently(stocks_data, market_data=None, symbol_sector=None):
+    """
+    Run _summarize_stock for each stock on a thread pool. The calls are
+    independent and network-bound; results come back in input order.
+    """
+    if not stocks_data:
+        return []
+    symbol_sector = symbol_sector or {}
+
+    def _summarize(stock_data):
+        print(f"  Processing stock: {stock_data['symbol']}...")
+        return _summarize_stock(
+            stock_data,
+            market_context=market_data,
+            sector_context=symbol_sector.get(stock_data['symbol']),
+        )
+
+    workers = min(MAX_SUMMARY_WORKERS, len(stocks_data))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_summarize, stocks_data))
+
+
+def _pack_batches(stocks_data, batch_size, market_data, symbol_sector):
+    """
+    Greedily group stocks, in order, into batches of at most batch_size whose
+    estimated tokens stay within BATCH_TOKEN_BUDGET. A stock over the budget
+    on its own ends up in a batch of one.
+    """
+    base = len(BATCH_SYSTEM_INSTRUCTION) // 4
+    if market_data:
+        base += len(_market_context_block(market_data)) // 4
+
+    batches = []
+    batch, used = [], base
+    for stock_data in stocks_data:
+        prompt = build_stock_prompt(
+            stock_data,
+            sector_context=symbol_sector.get(stock_data['symbol']),
+            standalone=False,
+        )
+        tokens = len(prompt) // 4 + STOCK_MAX_TOKENS
+        if batch and (len(batch) >= batch_size or used + tokens > BATCH_TOKEN_BUDGET):
+            batches.append(batch)
+            batch, used = [], base
+        batch.append(stock_data)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _summarize_batch(provider, batch_num, batch, market_data, symbol_sector):
+    """
+    Summarize one batch of stocks in a single LLM call. Falls back to per-stock
+    calls if the call fails or the response doesn't split cleanly.
+    """
+    if len(batch) == 1:
+        # Nothing to share a request with (e.g. a stock over the token budget
+        # on its own); the per-stock call skips the batch format
+        return _summarize_concurrently(batch, market_data, symbol_sector)
+
+    print(f"  Processing batch {batch_num} ({len(batch)} stocks)...")
+
+    # Instructions are in BATCH_SYSTEM_INSTRUCTION; the market context is the
+    # same for every batch in a run, so it goes first (shared prefix) and
+    # once, rather than inside each stock's block
+    market_section = ""
+    if market_data:
+        market_section = _market_context_block(market_data) + "\n\n"
+
+    # Each stock's detailed prompt, ruled off from the next
+    stock_prompts = [
+        build_stock_prompt(
+            stock_data,
+            sector_context=symbol_sector.get(stock_data['symbol']),
+            standalone=False,
+        )
+        for stock_data in batch
+    ]
+    batch_prompt = _BATCH_PROMPT_TMPL.format(
+        market=market_section,
+        count=len(batch),
+        stocks=_BATCH_STOCK_SEP.join(stock_prompts),
+    )
+
+    # Only responses that split cleanly are cached, so a malformed one
+    # is retried on the next run rather than replayed
+    cache_key = _llm_cache_key(provider, batch_prompt, BATCH_SYSTEM_INSTRUCTION)
+    try:
+        entry = file_cache.get(cache_key)
+        if entry is not None:
+            response_text = entry['data']
+        else:
+            response_text = _stream_batch_response(provider, batch_prompt, batch)
+        bodies = _split_batch_response(response_text, batch)
+        if bodies is not None and entry is None:
+            file_cache.set(cache_key, response_text, LLM_CACHE_TTL)
+    except Exception as e:
+        print(f"  Error in batch {batch_num}: {e}")
+        bodies = None
+
+    if bodies is None:
+        # Fallback to individual for this batch
+        return _summarize_concurrently(batch, market_data, symbol_sector)
+
+    summaries = []
+    for stock_data, body in zip(batch, bodies):
+        _store_summary(stock_data, body)
+        summaries.append(_format_entry(stock_data, body))
+    return summaries
+
+
 def generate_digest(stocks_data, batch_size=10, user_name=None):
     """
     Generate a complete daily digest for all stocks using batched API calls
 
     Args:
         stocks_data: List of stock data dicts
-        batch_size: Number of stocks to process per API call (default 10)
+        batch_size: Max stocks per API call (default 10); batches are also
+            capped at BATCH_TOKEN_BUDGET estimated tokens
         user_name: Optional name for personalized greeting
 
     Returns:
         Complete formatted digest string
     """
-    from datetime import datetime
-
     if not stocks_data:
         return ""
 
@@ -442,7 +902,7 @@ def generate_digest(stocks_data, batch_size=10, user_name=None):
         "",
         f"{greeting}",
         "",
-        "=" * 60,
+        _SEP_EQ,
         ""
     ]
 
@@ -458,7 +918,7 @@ def generate_digest(stocks_data, batch_size=10, user_name=None):
         digest_parts.append(market_data['summary'])
         digest_parts.append("")
 
-    digest_parts.append("=" * 60)
+    digest_parts.append(_SEP_EQ)
     digest_parts.append("")
 
     digest_header = "\n".join(digest_parts)
@@ -477,105 +937,62 @@ def generate_digest(stocks_data, batch_size=10, user_name=None):
         else:
             symbol_sector[symbol] = None
 
-    all_summaries = []
-    provider = _get_provider()
-
-    # Choose processing strategy based on provider capabilities
-    if provider.supports_batching():
-        # GEMINI PATH: Process stocks in batches
-        for i in range(0, len(stocks_data), batch_size):
-            batch = stocks_data[i:i + batch_size]
-
-            print(f"  Processing batch {i//batch_size + 1} ({len(batch)} stocks)...")
-
-            # Build prompt using the same detailed logic as individual summaries
-            market_section = ""
-            if market_data:
-                market_section = f"""
-Today's Market Context:
-- S&P 500: {market_data['spy_change']:+.2f}%
-- Nasdaq: {market_data['qqq_change']:+.2f}%
-- Dow Jones: {market_data['dia_change']:+.2f}%
-- Overview: {market_data['summary']}
-
-"""
-            batch_prompt = f"""You are a financial analyst providing daily stock updates.
-{market_section}
-For EACH stock below, provide a 3-4 sentence summary. DO NOT include any preamble like "Here's your update" or "Let me summarize". Start directly with the key information.
-
-Format EACH stock exactly as:
+    # Quiet stocks are filled in locally and unchanged ones come from the
+    # summary cache; only the rest go to the LLM
+    local_entries = [_local_entry(s) for s in stocks_data]
+    llm_stocks = [s for s, local in zip(stocks_data, local_entries) if local is None]
+    if len(llm_stocks) < len(stocks_data):
+        print(f"  Skipping LLM for {len(stocks_data) - len(llm_stocks)} quiet or unchanged stocks")
 
-**[Company Name] ([SYMBOL])**: $[price] ([+/-]X.XX%)
-
-[Your 3-4 sentence analysis]
-
----
-
-IMPORTANT: Add "---" separator after each stock EXCEPT the last one. The last stock should have NO separator after it.
-
-STOCKS TO ANALYZE:
-
-{'='*60}
-
-"""
-
-            # Add each stock with its detailed prompt
-            stock_prompts = []
-            for stock_data in batch:
-                stock_prompt = build_stock_prompt(
-                    stock_data,
-                    market_context=market_data,
-                    sector_context=symbol_sector.get(stock_data['symbol']),
-                )
-                stock_prompts.append(stock_prompt + "\n\n" + "="*60)
-
-            batch_prompt += "\n".join(stock_prompts)
+    provider = _get_provider()
 
-            try:
-                response_text = provider.generate(batch_prompt)
-                all_summaries.append(response_text)
-            except Exception as e:
-                print(f"  Error in batch {i//batch_size + 1}: {e}")
-                # Fallback to individual for this batch
-                for stock_data in batch:
-                    summary = summarize_stock_news(
-                        stock_data,
-                        market_context=market_data,
-                        sector_context=symbol_sector.get(stock_data['symbol']),
-                    )
-                    all_summaries.append(summary + "\n" + "-" * 60 + "\n")
-    else:
-        # CLAUDE PATH: Process stocks one at a time
-        print(f"  Processing {len(stocks_data)} stocks individually...")
-        for i, stock_data in enumerate(stocks_data, 1):
-            print(f"  Processing stock {i}/{len(stocks_data)}: {stock_data['symbol']}...")
-            summary = summarize_stock_news(
-                stock_data,
-                market_context=market_data,
-                sector_context=symbol_sector.get(stock_data['symbol']),
-            )
-            all_summaries.append(summary + "\n" + "-" * 60 + "\n")
+    def _summarize_llm(stocks):
+        # Choose processing strategy based on provider capabilities
+        if provider.supports_batching():
+            # GEMINI PATH: Process stocks in batches, several batches in flight
+            # at once (the provider's rate limiter is shared and thread-safe)
+            batches = _pack_batches(stocks, batch_size, market_data, symbol_sector)
+            workers = max(1, min(MAX_BATCH_WORKERS, len(batches)))
+            summaries = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_summarize_batch, provider, batch_num, batch, market_data, symbol_sector)
+                    for batch_num, batch in enumerate(batches, 1)
+                ]
+                for future in futures:
+                    summaries.extend(future.result())
+            return summaries
+
+        # CLAUDE PATH: One call per stock, issued concurrently
+        print(f"  Processing {len(stocks)} stocks individually...")
+        return _summarize_concurrently(stocks, market_data, symbol_sector)
+
+    # Symbols another user already summarized (or is summarizing) this run are
+    # reused; only the rest are sent to the LLM
+    llm_summaries = _shared_summaries(llm_stocks, _summarize_llm)
+
+    # Merge back into watchlist order
+    llm_iter = iter(llm_summaries)
+    all_summaries = [
+        (local if local is not None else next(llm_iter)) + _SUMMARY_SUFFIX
+        for local in local_entries
+    ]
 
     # Combine all summaries
-    digest = digest_header + "\n\n".join(all_summaries)
-
-    # Add dashed separators between stocks
-    digest = digest.replace("---\n\n**", "-" * 60 + "\n\n**")
-
-    return digest
+    return digest_header + "\n\n".join(all_summaries)
 
 def generate_digest_fallback(stocks_data):
     """Fallback: generate digest with individual API calls"""
-    from datetime import datetime
-
-    digest = f"# Daily Stock Digest - {datetime.now().strftime('%B %d, %Y')}\n\n"
-    digest += "=" * 60 + "\n\n"
+    parts = [
+        f"# Daily Stock Digest - {datetime.now().strftime('%B %d, %Y')}\n\n",
+        _SEP_EQ + "\n\n",
+    ]
 
-    for stock_data in stocks_data:
-        summary = summarize_stock_news(stock_data)
-        digest += summary + "\n" + "-" * 60 + "\n\n"
+    # Per-stock calls run concurrently; results come back in watchlist order
+    for summary in _shared_summaries(stocks_data, _summarize_concurrently):
+        parts.append(summary + _SUMMARY_SUFFIX + "\n")
 
-    return digest
+    return "".join(parts)
 
 if __name__ == "__main__":
     # Test with sample data
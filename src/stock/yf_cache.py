@@ -0,0 +1,171 @@
+"""
+Per-run memoization of yFinance Ticker objects and their .info dicts.
+
+Price, news, earnings, and sector fetchers all look up the same symbols;
+sharing one Ticker per symbol means .info (a full quoteSummary request) is
+fetched at most once per run.
+
+yfinance (and the pandas/curl_cffi stack behind it) is imported on first use,
+so modules that only format or summarize already-fetched data stay cheap to
+import.
+"""
+
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from utils.file_cache import cached
+from utils.rate_limiter import AdaptiveRateLimiter
+
+if TYPE_CHECKING:
+    import yfinance as yf
+
+
+@lru_cache(maxsize=None)
+def _get_session():
+    """
+    One HTTP session for every Yahoo request so TLS connections are reused across
+    symbols and endpoints (curl_cffi keeps a handle per thread, so it is safe to
+    share with the fetch thread pool)
+    """
+    from curl_cffi import requests as curl_requests
+    return curl_requests.Session(impersonate="chrome")
+
+# Pacing for Yahoo's chart (price) endpoint
+YAHOO_PRICE_RPM = 50
+RATE_LIMIT_BACKOFF_SECONDS = 30
+yahoo_limiter = AdaptiveRateLimiter(rpm=YAHOO_PRICE_RPM)
+
+# yf.download collects each call's frames and errors in module-global state
+# (yfinance.shared), so overlapping calls can clobber or drop each other's
+# results. Watchlist fetches (one per user thread) and the market overview's
+# index download both go through download_history, which holds this lock.
+_download_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_ticker(symbol: str) -> 'yf.Ticker':
+    """Return the shared Ticker for a symbol."""
+    import yfinance as yf
+    return yf.Ticker(symbol.upper(), session=_get_session())
+
+
+@lru_cache(maxsize=None)
+def get_info(symbol: str) -> dict:
+    """Return the symbol's .info dict. Failures propagate and are not cached."""
+    return get_ticker(symbol).info
+
+
+# The only .info fields needed outside of earnings: display name, sector
+# mapping, and the company description for thesis prompts
+PROFILE_FIELDS = ('longName', 'shortName', 'industry', 'sector', 'longBusinessSummary')
+PROFILE_CACHE_TTL = 24 * 60 * 60  # 24 hours
+
+
+@cached('profile', ttl=PROFILE_CACHE_TTL)
+def get_profile(symbol: str) -> dict:
+    """
+    Return the small, slow-changing subset of .info, cached on disk for the day.
+    Warm runs skip the quoteSummary request entirely; fast_info has no name field.
+    """
+    info = get_info(symbol)
+    return {k: info[k] for k in PROFILE_FIELDS if k in info}
+
+
+def yahoo_call(fn, *args, **kwargs):
+    """
+    Call a Yahoo-backed function under yahoo_limiter. On a rate-limit error,
+    halve the limiter's rate, wait, and retry once before giving up.
+    """
+    from yfinance.exceptions import YFRateLimitError
+
+    yahoo_limiter.wait_if_needed()
+    try:
+        result = fn(*args, **kwargs)
+    except YFRateLimitError:
+        yahoo_limiter.throttle()
+        time.sleep(RATE_LIMIT_BACKOFF_SECONDS)
+        yahoo_limiter.wait_if_needed()
+        result = fn(*args, **kwargs)
+    yahoo_limiter.record_success()
+    return result
+
+
+def _split_frames(df, symbols: list[str]) -> dict:
+    """{symbol: DataFrame} from a group_by='ticker' download, skipping empty ones."""
+    if df is None or df.empty:
+        return {}
+
+    histories = {}
+    available = set(df.columns.get_level_values(0))
+    for symbol in symbols:
+        if symbol not in available:
+            continue
+        hist = df[symbol].dropna(how='all')
+        if not hist.empty:
+            histories[symbol] = hist
+    return histories
+
+
+def _batch_download(yf, symbols: list[str], period: str) -> tuple[dict, list[str]]:
+    """
+    One paced yf.download. Returns (histories, rate-limited symbols).
+    yf.download doesn't raise YFRateLimitError; it records per-symbol failures
+    in yfinance.shared._ERRORS (read here, under _download_lock, before the
+    next download resets it) and returns partial frames.
+    """
+    yahoo_limiter.wait_if_needed()
+    df = yf.download(
+        list(symbols), period=period, group_by='ticker',
+        threads=True, progress=False, session=_get_session(),
+    )
+    errors = getattr(yf.shared, '_ERRORS', {})
+    limited = [
+        s for s in symbols
+        if any(marker in str(errors.get(s.upper(), '')) for marker in ('RateLimit', 'Too Many Requests'))
+    ]
+    if not limited:
+        yahoo_limiter.record_success()
+    return _split_frames(df, symbols), limited
+
+
+def download_history(symbols: list[str], period: str = "2d") -> dict:
+    """
+    Fetch price history for many symbols in one batched yf.download call.
+    Returns {symbol: DataFrame}; symbols Yahoo returned no rows for are omitted
+    so callers can fall back to a per-symbol Ticker.history(). Calls are
+    serialized (see _download_lock). Symbols that were rate-limited get the
+    same throttle-and-retry-once treatment as yahoo_call.
+    """
+    if not symbols:
+        return {}
+
+    try:
+        import yfinance as yf
+        with _download_lock:
+            histories, limited = _batch_download(yf, symbols, period)
+            if limited:
+                yahoo_limiter.throttle()
+                time.sleep(RATE_LIMIT_BACKOFF_SECONDS)
+                retried, _ = _batch_download(yf, limited, period)
+                histories.update(retried)
+    except Exception as e:
+        print(f"  Batch price download failed: {e}")
+        return {}
+    return histories
+
+
+def close_change_pct(hist) -> float:
+    """
+    Percent change between the last two closes of a price history (at least
+    two rows). Works on the raw ndarray rather than three .iloc lookups.
+    """
+    closes = hist['Close'].to_numpy()
+    return float((closes[-1] - closes[-2]) / closes[-2] * 100)
+
+
+def clear_ticker_cache() -> None:
+    """Drop all memoized Tickers and info dicts."""
+    get_info.cache_clear()
+    get_ticker.cache_clear()
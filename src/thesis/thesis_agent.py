@@ -21,7 +21,7 @@ from utils.debug import debug_log
 from db.queries import get_thesis, save_verdict
 from utils.news_injector import get_injected_articles
 
-from stock.fetch_news import fetch_stock_news
+from stock.fetch_news import NewsItem, fetch_stock_news
 from stock.fetch_earnings import fetch_earnings_data
 
 DEFAULT_LLM_PROVIDER = 'claude'
@@ -47,8 +47,8 @@ def _get_company_description(ticker: str) -> str:
     """Return longBusinessSummary from cache, falling back to a direct yFinance call."""
     info = stock_cache.get_info(ticker)
     if info is None:
-        import yfinance as yf
-        info = yf.Ticker(ticker).info
+        from stock.yf_cache import get_profile
+        info = get_profile(ticker)
     return info.get('longBusinessSummary', '')
 
 
@@ -61,8 +61,8 @@ def _build_prompt(ticker: str, thesis: dict, news: list, earnings: dict | None)
         items = []
         for a in news:
             items.append(
-                f"- [{a['published']}] {a['title']} ({a['publisher']})\n"
-                f"  {a['summary']}"
+                f"- [{a.published}] {a.title} ({a.publisher})\n"
+                f"  {a.summary}"
             )
         news_block = "\n".join(items)
     else:
@@ -193,11 +193,25 @@ class ThesisAgent:
             'body': thesis_obj.body,
         }
 
+        # Callers that already fetched this ticker pass its news; earnings=None
+        # then means "no recent earnings", not "not fetched yet", so only go
+        # back to yFinance for earnings when nothing was supplied
+        fetch_earnings = earnings is None and news is None
+
         # Inject fake news if requested, otherwise use real news
         if injected_news is not None:
-            news = get_injected_articles(ticker, injected_news, scenario)
+            news = [
+                NewsItem(
+                    title=a.get('title', ''),
+                    publisher=a.get('publisher', ''),
+                    link=a.get('url', ''),
+                    published=a.get('published', ''),
+                    summary=a.get('summary', ''),
+                )
+                for a in get_injected_articles(ticker, injected_news, scenario)
+            ]
             debug_content = "\n\n".join(
-                f"[{a.get('published', '')}] {a.get('title', '')}\n  {a.get('summary', '')}"
+                f"[{a.published}] {a.title}\n  {a.summary}"
                 for a in news
             )
             debug_log(f"INJECTED NEWS — {ticker} ({scenario})", debug_content)
@@ -205,7 +219,7 @@ class ThesisAgent:
             if news is None:
                 news = fetch_stock_news(ticker)
 
-        if earnings is None:
+        if fetch_earnings:
             earnings = fetch_earnings_data(ticker)
 
         prompt = _build_prompt(ticker, thesis, news, earnings)
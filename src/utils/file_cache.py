@@ -0,0 +1,110 @@
+"""
+On-disk JSON cache for yFinance responses.
+
+Entries are stored as {"ts": epoch, "ttl": seconds, "data": ...} under
+.cache/{SYMBOL}/{endpoint}-{YYYYMMDD}-{params hash}.json, so intraday reruns
+skip the HTTP call and everything expires at the UTC day boundary.
+
+Usage:
+    from utils.file_cache import cached
+
+    @cached('news', ttl=60 * 60)
+    def fetch_stock_news(symbol, days_back=7): ...
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import orjson
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '.cache')
+
+
+# orjson handles numpy arrays/scalars and datetimes (incl. pd.Timestamp) natively
+_ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _json_default(obj):
+    """Serialize anything orjson doesn't cover natively (e.g. pandas scalars)."""
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+class FileCache:
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        """Return the stored entry for key, or None if missing, unreadable, or expired."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                entry = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+
+        if time.time() - entry.get('ts', 0) > entry.get('ttl', 0):
+            return None
+        return entry
+
+    def set(self, key: str, value, ttl: float) -> None:
+        """Store value under key for ttl seconds. Write failures are non-fatal."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            payload = orjson.dumps(
+                {'ts': time.time(), 'ttl': ttl, 'data': value},
+                default=_json_default, option=_ORJSON_OPTS,
+            )
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            print(f"  [cache] Could not write {key}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+# Module-level singleton — import this directly
+file_cache = FileCache()
+
+
+def cached(endpoint: str, ttl: float, none_ttl: float | None = None):
+    """
+    Cache a fetcher's result on disk. The decorated function must take the
+    ticker symbol as its first argument; any other arguments are hashed into
+    the key. None results are cached too, so "no data" isn't re-fetched;
+    pass none_ttl to keep them for less time (0 skips caching them).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(symbol, *args, **kwargs):
+            today = datetime.now(timezone.utc).date().isoformat()
+            params = json.dumps([args, kwargs, today], sort_keys=True, default=str)
+            digest = hashlib.md5(params.encode('utf-8')).hexdigest()[:12]
+            key = f"{symbol.upper()}/{endpoint}-{today.replace('-', '')}-{digest}"
+
+            entry = file_cache.get(key)
+            if entry is not None:
+                return entry['data']
+
+            result = fn(symbol, *args, **kwargs)
+            result_ttl = ttl if result is not None or none_ttl is None else none_ttl
+            if result_ttl > 0:
+                file_cache.set(key, result, result_ttl)
+            return result
+        return wrapper
+    return decorator
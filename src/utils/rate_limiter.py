@@ -4,15 +4,26 @@ Rate limiter for API calls to respect service quotas
 Because we're brokies using Gemini's free tier like true degenerates.
 """
 
+import atexit
+import json
+import os
+import threading
 import time
-from datetime import datetime, timedelta
+from bisect import bisect_left
 from collections import deque
 
+from utils.file_cache import CACHE_DIR
+
 # RATE LIMIT CONFIGURATION
 # We finally caved and enabled billing because 20/day was embarrassing
 # But we're keeping this rate limiter because we're not COMPLETELY financially irresponsible
 REQUESTS_PER_MINUTE = 1000  # If we hit this, something has gone very wrong... or very right
 REQUESTS_PER_DAY = 999999   # This would actually be absurd, and might actually bankrupt me
+TOKENS_PER_MINUTE = 1_000_000  # Gemini Flash paid tier 1 input+output TPM
+
+SECONDS_PER_MINUTE = 60.0
+SECONDS_PER_DAY = 24 * 60 * 60.0
+SAVE_INTERVAL_SECONDS = 1.0  # debounce for persisted daily counts
 
 class RateLimiter:
     """
@@ -21,62 +32,128 @@ class RateLimiter:
     Tracks both per-minute and per-day request limits and automatically
     waits when approaching limits. Because getting rate limited is for
     losers who don't plan ahead.
+
+    All timestamps are time.monotonic() floats, so wall-clock jumps (NTP,
+    DST) can't skew the windows.
+
+    Pass state_file (a name under .cache/) to persist the daily count across
+    runs, so ad-hoc reruns can't silently blow through the daily quota.
     """
 
-    def __init__(self, rpm=REQUESTS_PER_MINUTE, rpd=REQUESTS_PER_DAY):
+    def __init__(self, rpm=REQUESTS_PER_MINUTE, rpd=REQUESTS_PER_DAY, state_file=None):
         self.requests_per_minute = rpm
         self.requests_per_day = rpd
-        self.request_times = deque()  # Track request timestamps
+        # Fixed-size circular buffer of request timestamps (ascending); only the
+        # last `rpm` requests can matter for the window, older ones fall off
+        self.request_times: deque[float] = deque(maxlen=rpm)
         self.daily_count = 0
-        self.daily_reset_time = datetime.now() + timedelta(days=1)
+        self.daily_reset_time: float = time.monotonic() + SECONDS_PER_DAY
+        self._lock = threading.Lock()  # fetch threads share limiters
+
+        self._state_path = os.path.join(CACHE_DIR, state_file) if state_file else None
+        self._dirty = False
+        self._last_save = 0.0
+        if self._state_path:
+            self._load()
+            atexit.register(self._flush)
+
+    def _load(self):
+        """Restore daily_count and the reset deadline from disk, if still current."""
+        try:
+            with open(self._state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        # The reset deadline is stored as wall-clock epoch; map it onto the monotonic clock
+        remaining = state.get('daily_reset_at', 0) - time.time()
+        if 0 < remaining <= SECONDS_PER_DAY:
+            self.daily_count = int(state.get('daily_count', 0))
+            self.daily_reset_time = time.monotonic() + remaining
+
+    def _save(self):
+        """Atomically write daily_count and the reset deadline to disk."""
+        state = {
+            'daily_count': self.daily_count,
+            'daily_reset_at': time.time() + (self.daily_reset_time - time.monotonic()),
+        }
+        tmp_path = f"{self._state_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self._state_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._state_path)
+        except OSError as e:
+            print(f"  [rate limiter] Could not save state: {e}")
+            return
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _mark_dirty(self):
+        """Record a state change; writes are debounced to one per SAVE_INTERVAL_SECONDS."""
+        if not self._state_path:
+            return
+        self._dirty = True
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL_SECONDS:
+            self._save()
+
+    def _flush(self):
+        """Write any unsaved state (registered with atexit)."""
+        with self._lock:
+            if self._dirty:
+                self._save()
 
     def wait_if_needed(self):
         """Wait if we're about to exceed rate limits"""
-        now = datetime.now()
+        with self._lock:
+            self._wait_if_needed()
+
+    def _window_start(self, one_minute_ago: float) -> int:
+        """Index of the first timestamp inside the one-minute window."""
+        return bisect_left(self.request_times, one_minute_ago)
+
+    def _wait_if_needed(self):
+        now = time.monotonic()
 
         # Reset daily counter if needed
         if now >= self.daily_reset_time:
             self.daily_count = 0
-            self.daily_reset_time = now + timedelta(days=1)
+            self.daily_reset_time = now + SECONDS_PER_DAY
 
         # Check daily limit
         if self.daily_count >= self.requests_per_day:
-            wait_seconds = (self.daily_reset_time - now).total_seconds()
+            wait_seconds = self.daily_reset_time - now
             print(f"⚠️  Daily rate limit reached. Waiting {wait_seconds:.0f}s until reset...")
             time.sleep(wait_seconds)
+            now = time.monotonic()
             self.daily_count = 0
-            self.daily_reset_time = datetime.now() + timedelta(days=1)
+            self.daily_reset_time = now + SECONDS_PER_DAY
 
-        # Remove timestamps older than 1 minute
-        one_minute_ago = now - timedelta(minutes=1)
-        while self.request_times and self.request_times[0] < one_minute_ago:
-            self.request_times.popleft()
+        # Requests in the last minute — stale timestamps are never popped, the
+        # circular buffer overwrites them
+        start = self._window_start(now - SECONDS_PER_MINUTE)
+        active = len(self.request_times) - start
 
         # Check per-minute limit (leave 1 request buffer because 429 errors are embarrassing)
-        if len(self.request_times) >= self.requests_per_minute - 1:
-            # Wait until oldest request is >1 minute old
-            oldest = self.request_times[0]
-            wait_seconds = 60 - (now - oldest).total_seconds()
+        if active and active >= self.requests_per_minute - 1:
+            # Wait until oldest request in the window is >1 minute old
+            wait_seconds = SECONDS_PER_MINUTE - (now - self.request_times[start])
             if wait_seconds > 0:
                 print(f"  Rate limit: waiting {wait_seconds:.1f}s...")
                 time.sleep(wait_seconds)
-                # Clear old timestamps after waiting
-                now = datetime.now()
-                one_minute_ago = now - timedelta(minutes=1)
-                while self.request_times and self.request_times[0] < one_minute_ago:
-                    self.request_times.popleft()
+                now = time.monotonic()
 
         # Record this request
         self.request_times.append(now)
         self.daily_count += 1
+        self._mark_dirty()
 
     def get_stats(self):
         """Get current rate limit usage stats"""
-        now = datetime.now()
-        one_minute_ago = now - timedelta(minutes=1)
+        one_minute_ago = time.monotonic() - SECONDS_PER_MINUTE
 
-        # Count requests in last minute
-        recent_requests = sum(1 for t in self.request_times if t > one_minute_ago)
+        # Timestamps are appended in order, so the window start is a binary search
+        recent_requests = len(self.request_times) - self._window_start(one_minute_ago)
 
         return {
             'requests_last_minute': recent_requests,
@@ -87,6 +164,91 @@ class RateLimiter:
 
     def reset(self):
         """Reset all counters (useful for testing, or when I finally upgrade to paid tier lol)"""
-        self.request_times.clear()
-        self.daily_count = 0
-        self.daily_reset_time = datetime.now() + timedelta(days=1)
+        with self._lock:
+            self.request_times.clear()
+            self.daily_count = 0
+            self.daily_reset_time = time.monotonic() + SECONDS_PER_DAY
+            self._mark_dirty()
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    RateLimiter whose per-minute limit reacts to the server: halved whenever we
+    get throttled, then doubled back toward the configured ceiling after a run
+    of successful calls. For Yahoo, whose real limits are undocumented.
+    """
+
+    MIN_RPM = 2  # wait_if_needed keeps a 1-request buffer, so 1 would never pass
+    RAMP_UP_AFTER = 20  # consecutive successes before raising the limit again
+
+    def __init__(self, rpm=REQUESTS_PER_MINUTE, rpd=REQUESTS_PER_DAY):
+        super().__init__(rpm, rpd)
+        self.max_requests_per_minute = rpm
+        self._successes = 0
+
+    def throttle(self):
+        """Back off multiplicatively after a rate-limit response."""
+        with self._lock:
+            self.requests_per_minute = max(self.MIN_RPM, self.requests_per_minute // 2)
+            self._successes = 0
+        print(f"  Rate limited — lowering to {self.requests_per_minute} requests/min")
+
+    def record_success(self):
+        """Count a successful call; ramp back up after enough of them in a row."""
+        with self._lock:
+            self._successes += 1
+            if (self._successes >= self.RAMP_UP_AFTER
+                    and self.requests_per_minute < self.max_requests_per_minute):
+                self.requests_per_minute = min(self.max_requests_per_minute, self.requests_per_minute * 2)
+                self._successes = 0
+
+
+class TokenBucket:
+    """
+    Per-minute request and token budgets for concurrent callers.
+
+    Both budgets refill continuously (rpm/60 requests and tpm/60 tokens per
+    second) instead of in a sliding window, so parallel batches can go out
+    together as long as there is capacity, and only the callers that would
+    overdraw a budget wait. acquire() returns the reservation to pass back to
+    release() if the call fails before the provider counted it.
+    """
+
+    def __init__(self, rpm=REQUESTS_PER_MINUTE, tpm=TOKENS_PER_MINUTE):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / SECONDS_PER_MINUTE)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / SECONDS_PER_MINUTE)
+
+    def acquire(self, tokens: int) -> int:
+        """Block until one request and `tokens` tokens are available, then take them."""
+        tokens = min(tokens, self.tpm)  # an oversized call still gets to run once the bucket is full
+        with self._cond:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return tokens
+                wait_seconds = max(
+                    (1 - self._requests) * SECONDS_PER_MINUTE / self.rpm,
+                    (tokens - self._tokens) * SECONDS_PER_MINUTE / self.tpm,
+                )
+                self._cond.wait(timeout=wait_seconds)
+
+    def release(self, tokens: int):
+        """Refund a reservation from acquire() for a call that failed."""
+        with self._cond:
+            self._refill()
+            self._requests = min(self.rpm, self._requests + 1)
+            self._tokens = min(self.tpm, self._tokens + tokens)
+            self._cond.notify_all()
@@ -1,50 +1,124 @@
+import html
 import os
+import re
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import ssl
+from email.message import EmailMessage
 from dotenv import load_dotenv
 from datetime import datetime
 
 load_dotenv()
 
-def send_digest_email(digest_content, recipient_email=None):
-    """
-    Send the daily digest via email
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 587  # submission port; upgraded to TLS with STARTTLS
+SMTP_TIMEOUT_SECONDS = 30
 
-    Args:
-        digest_content: String containing the full digest
-        recipient_email: Optional email override (defaults to env variable)
-    """
+# One TLS context for every connection, so reconnects don't reload the CA bundle
+_SSL_CONTEXT = ssl.create_default_context()
 
-    # Email configuration from environment variables
+
+def _get_credentials():
+    """Return (sender_email, sender_password) from the environment."""
     sender_email = os.getenv('SENDER_EMAIL')
     sender_password = os.getenv('SENDER_PASSWORD')
-    recipient = recipient_email or os.getenv('RECIPIENT_EMAIL', sender_email)
 
     if not sender_email or not sender_password:
         raise ValueError("SENDER_EMAIL and SENDER_PASSWORD must be set in .env file")
 
-    # Create message
-    msg = MIMEMultipart('alternative')
+    return sender_email, sender_password
+
+
+class SMTPSession:
+    """
+    Authenticated SMTP connection reused across several sends, so a batch of
+    emails pays for one TLS handshake + login instead of one per message.
+
+    Usage:
+        with SMTPSession(sender_email, sender_password) as session:
+            session.send(msg)
+    """
+
+    def __init__(self, sender_email, sender_password):
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.server = None
+
+    def __enter__(self):
+        self._connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _connect(self):
+        self.close()
+        self.server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        self.server.starttls(context=_SSL_CONTEXT)
+        self.server.login(self.sender_email, self.sender_password)
+
+    def send(self, msg):
+        """Send a message, reconnecting first if the server dropped the connection."""
+        try:
+            code, _ = self.server.noop()
+            if code != 250:
+                self._connect()
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._connect()
+
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._connect()
+            self.server.send_message(msg)
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.server = None
+
+
+def _build_message(digest_content, sender_email, recipient):
+    """Build the multipart/alternative (plain + HTML) digest message."""
+    msg = EmailMessage()
     msg['Subject'] = f"Daily Stock Digest - {datetime.now().strftime('%B %d, %Y')}"
     msg['From'] = sender_email
     msg['To'] = recipient
 
-    # Convert markdown-style formatting to HTML
-    html_content = markdown_to_html(digest_content)
+    # Plain text body with the markdown-converted HTML as its alternative
+    msg.set_content(digest_content)
+    msg.add_alternative(markdown_to_html(digest_content), subtype='html')
+    return msg
 
-    # Attach both plain text and HTML versions
-    text_part = MIMEText(digest_content, 'plain')
-    html_part = MIMEText(html_content, 'html')
 
-    msg.attach(text_part)
-    msg.attach(html_part)
+def send_digest_email(digest_content, recipient_email=None, session=None):
+    """
+    Send the daily digest via email
+
+    Args:
+        digest_content: String containing the full digest
+        recipient_email: Optional email override (defaults to env variable)
+        session: Optional open SMTPSession to send through (one is opened
+            and closed for this send if omitted)
+    """
+
+    # Email configuration from environment variables
+    sender_email, sender_password = _get_credentials()
+    recipient = recipient_email or os.getenv('RECIPIENT_EMAIL', sender_email)
+
+    # Create message
+    msg = _build_message(digest_content, sender_email, recipient)
 
     try:
-        # Connect to Gmail's SMTP server
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
+        if session is not None:
+            session.send(msg)
+        else:
+            # Connect to Gmail's SMTP server
+            with SMTPSession(sender_email, sender_password) as new_session:
+                new_session.send(msg)
 
         print(f"✓ Digest email sent successfully to {recipient}")
         return True
@@ -53,42 +127,69 @@ def send_digest_email(digest_content, recipient_email=None):
         print(f"✗ Error sending email: {e}")
         return False
 
+
+def send_digest_emails(digest_content, recipients):
+    """
+    Send the same digest to several recipients over one SMTP connection.
+    Returns a list of per-recipient success flags.
+    """
+    sender_email, sender_password = _get_credentials()
+    try:
+        with SMTPSession(sender_email, sender_password) as session:
+            return [send_digest_email(digest_content, r, session=session) for r in recipients]
+    except Exception as e:
+        print(f"✗ Error connecting to SMTP server: {e}")
+        return [False] * len(recipients)
+
+
+# Email HTML wrapper, minified and split around the body once at import so each
+# send only concatenates the rendered digest between them
+_HTML_STYLE = (
+    "body{font-family:Arial,sans-serif;line-height:1.6;color:#333;max-width:800px;margin:0 auto;padding:20px}"
+    "h1{color:#2c3e50;border-bottom:3px solid #3498db;padding-bottom:10px}"
+    "strong{color:#2c3e50}"
+    "hr{border:2px solid #3498db;margin:20px 0}"
+)
+_HTML_PREFIX = f"<html><head><style>{_HTML_STYLE}</style></head><body>"
+_HTML_SUFFIX = "</body></html>"
+
+# One pass over the digest: each named group is a markdown construct we render,
+# and the text between matches is HTML-escaped
+_MD_RE = re.compile(
+    r'\*\*(?P<bold>.*?)\*\*|^# (?P<h1>.*)$|(?P<br>\n\n)|(?P<hr_eq>={60})|(?P<hr_dash>-{60})',
+    re.MULTILINE,
+)
+
+_MD_TAGS = {
+    'br': '<br><br>',
+    'hr_eq': '<hr>',
+    'hr_dash': '<hr style="border: 1px dashed #ccc;">',
+}
+
+
+def _render_markdown(content):
+    """Render digest markdown to an HTML fragment, escaping all raw text."""
+    parts = []
+    pos = 0
+    for m in _MD_RE.finditer(content):
+        parts.append(html.escape(content[pos:m.start()], quote=False))
+        kind = m.lastgroup
+        if kind == 'bold':
+            parts.append(f"<strong>{html.escape(m['bold'], quote=False)}</strong>")
+        elif kind == 'h1':
+            parts.append(f"<h1>{_render_markdown(m['h1'])}</h1>")
+        else:
+            parts.append(_MD_TAGS[kind])
+        pos = m.end()
+    parts.append(html.escape(content[pos:], quote=False))
+    return "".join(parts)
+
+
 def markdown_to_html(content):
     """
     Simple markdown to HTML converter for email formatting
     """
-    html = content
-
-    # Convert headers
-    html = html.replace('# ', '<h1>').replace('\n\n', '</h1>\n\n', 1)
-
-    # Convert bold
-    import re
-    html = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', html)
-
-    # Convert line breaks and separators
-    html = html.replace('\n\n', '<br><br>')
-    html = html.replace('=' * 60, '<hr>')
-    html = html.replace('-' * 60, '<hr style="border: 1px dashed #ccc;">')
-
-    # Wrap in HTML template
-    html_template = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 800px; margin: 0 auto; padding: 20px; }}
-            h1 {{ color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
-            strong {{ color: #2c3e50; }}
-            hr {{ border: 2px solid #3498db; margin: 20px 0; }}
-        </style>
-    </head>
-    <body>
-        {html}
-    </body>
-    </html>
-    """
-
-    return html_template
+    return _HTML_PREFIX + _render_markdown(content) + _HTML_SUFFIX
 
 if __name__ == "__main__":
     # Test email sending